@@ -0,0 +1,562 @@
+"""Minimal offline stand-ins for the Home Assistant APIs used by Broadlink Manager.
+
+Only the behaviour the integration relies on is modelled: an event bus, a
+service registry, device/entity registries with the indexes Home Assistant
+keeps, JSON Store files under a temporary config directory and a button
+entity platform. install() registers the fake modules in sys.modules so the
+integration can be imported without Home Assistant, watchdog or
+python-broadlink being installed.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import types
+import uuid
+
+EVENT_DEVICE_REGISTRY_UPDATED = "device_registry_updated"
+EVENT_ENTITY_REGISTRY_UPDATED = "entity_registry_updated"
+EVENT_HOMEASSISTANT_STOP = "homeassistant_stop"
+EVENT_HOMEASSISTANT_FINAL_WRITE = "homeassistant_final_write"
+EVENT_STATE_CHANGED = "state_changed"
+STATE_UNAVAILABLE = "unavailable"
+CONNECTION_NETWORK_MAC = "mac"
+
+
+def callback(func):
+    return func
+
+
+class HomeAssistantError(Exception):
+    pass
+
+
+class _Bus:
+    def __init__(self):
+        self._listeners = {}
+
+    def async_listen(self, event_type, listener):
+        listeners = self._listeners.setdefault(event_type, [])
+        listeners.append(listener)
+
+        def unsub():
+            if listener in listeners:
+                listeners.remove(listener)
+
+        return unsub
+
+    def async_listen_once(self, event_type, listener):
+        unsub = None
+
+        def _once(event):
+            unsub()
+            return listener(event)
+
+        unsub = self.async_listen(event_type, _once)
+        return unsub
+
+    def async_fire(self, event_type, data=None):
+        event = types.SimpleNamespace(event_type=event_type, data=data or {})
+        tasks = []
+        for listener in list(self._listeners.get(event_type, ())):
+            result = listener(event)
+            if asyncio.iscoroutine(result):
+                tasks.append(asyncio.get_running_loop().create_task(result))
+        return tasks
+
+
+class ServiceCall:
+    def __init__(self, domain, service, data):
+        self.domain = domain
+        self.service = service
+        self.data = data
+
+
+class _Services:
+    def __init__(self):
+        self._handlers = {}
+        self.calls = 0
+
+    def has_service(self, domain, service):
+        return (domain, service) in self._handlers
+
+    def async_register(self, domain, service, handler, schema=None, **kwargs):
+        self._handlers[(domain, service)] = handler
+
+    async def async_call(self, domain, service, service_data=None, blocking=False):
+        self.calls += 1
+        result = self._handlers[(domain, service)](
+            ServiceCall(domain, service, service_data or {})
+        )
+        if asyncio.iscoroutine(result):
+            await result
+
+
+class State:
+    def __init__(self, entity_id, state):
+        self.entity_id = entity_id
+        self.state = state
+
+
+class _States:
+    def __init__(self, bus):
+        self._bus = bus
+        self._states = {}
+
+    def get(self, entity_id):
+        return self._states.get(entity_id)
+
+    def async_set(self, entity_id, state):
+        old_state = self._states.get(entity_id)
+        new_state = self._states[entity_id] = State(entity_id, state)
+        self._bus.async_fire(
+            EVENT_STATE_CHANGED,
+            {"entity_id": entity_id, "old_state": old_state, "new_state": new_state},
+        )
+
+
+class _Config:
+    def __init__(self, config_dir):
+        self.config_dir = config_dir
+
+    def path(self, *parts):
+        return os.path.join(self.config_dir, *parts)
+
+
+class _ConfigEntries:
+    def async_entries(self, domain=None):
+        return []
+
+
+class HomeAssistant:
+    def __init__(self, config_dir):
+        self.loop = asyncio.get_running_loop()
+        self.data = {}
+        self.bus = _Bus()
+        self.services = _Services()
+        self.states = _States(self.bus)
+        self.config = _Config(config_dir)
+        self.config_entries = _ConfigEntries()
+        self._tasks = set()
+
+    def async_add_executor_job(self, func, *args):
+        return self.loop.run_in_executor(None, func, *args)
+
+    def async_create_task(self, coro, name=None):
+        task = self.loop.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def async_create_background_task(self, coro, name=None):
+        return self.loop.create_task(coro)
+
+    async def async_block_till_done(self):
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks))
+        await asyncio.sleep(0)
+
+
+class ConfigEntry:
+    def __init__(self, data, options=None, title="Hub"):
+        self.entry_id = uuid.uuid4().hex
+        self.data = data
+        self.options = options or {}
+        self.title = title
+        self.unique_id = None
+
+
+# Registries -----------------------------------------------------------------
+
+
+class DeviceEntry:
+    def __init__(self, identifiers, name=None, config_entry_id=None):
+        self.id = uuid.uuid4().hex
+        self.identifiers = set(identifiers)
+        self.name = name
+        self.name_by_user = None
+        self.config_entries = {config_entry_id} if config_entry_id else set()
+
+
+class DeviceRegistry:
+    def __init__(self, hass):
+        self.hass = hass
+        self.devices = {}
+        self._by_identifier = {}
+
+    def async_get(self, device_id):
+        return self.devices.get(device_id)
+
+    def async_get_device(self, identifiers=None, connections=None):
+        for identifier in identifiers or ():
+            device_id = self._by_identifier.get(identifier)
+            if device_id:
+                return self.devices[device_id]
+        return None
+
+    def async_get_or_create(self, config_entry_id=None, identifiers=None, **kwargs):
+        device = self.async_get_device(identifiers)
+        if device is not None:
+            return device
+        device = DeviceEntry(identifiers, kwargs.get("name"), config_entry_id)
+        self.devices[device.id] = device
+        for identifier in device.identifiers:
+            self._by_identifier[identifier] = device.id
+        self.hass.bus.async_fire(
+            EVENT_DEVICE_REGISTRY_UPDATED, {"action": "create", "device_id": device.id}
+        )
+        return device
+
+    def async_remove_device(self, device_id):
+        device = self.devices.pop(device_id, None)
+        if device is None:
+            return
+        for identifier in device.identifiers:
+            self._by_identifier.pop(identifier, None)
+        entity_registry = async_get_entity_registry(self.hass)
+        for entry in list(async_entries_for_device(entity_registry, device_id)):
+            entity_registry.async_remove(entry.entity_id)
+        self.hass.bus.async_fire(
+            EVENT_DEVICE_REGISTRY_UPDATED, {"action": "remove", "device_id": device_id}
+        )
+
+
+class EntityEntry:
+    def __init__(self, entity_id, unique_id, platform, device_id=None):
+        self.entity_id = entity_id
+        self.unique_id = unique_id
+        self.platform = platform
+        self.domain = entity_id.split(".", 1)[0]
+        self.device_id = device_id
+
+
+class EntityRegistry:
+    def __init__(self, hass):
+        self.hass = hass
+        self.entities = {}
+        self._by_unique_id = {}
+        self._by_device = {}
+        self.platform_entities = {}  # entity_id -> live entity object
+
+    def async_get(self, entity_id):
+        return self.entities.get(entity_id)
+
+    def async_get_entity_id(self, domain, platform, unique_id):
+        return self._by_unique_id.get((domain, platform, unique_id))
+
+    def async_get_or_create(self, domain, platform, unique_id, device_id=None):
+        entity_id = self.async_get_entity_id(domain, platform, unique_id)
+        if entity_id:
+            return self.entities[entity_id]
+        entity_id = f"{domain}.{uuid.uuid4().hex[:12]}"
+        entry = EntityEntry(entity_id, unique_id, platform, device_id)
+        self.entities[entity_id] = entry
+        self._by_unique_id[(domain, platform, unique_id)] = entity_id
+        if device_id:
+            self._by_device.setdefault(device_id, {})[entity_id] = entry
+        self.hass.bus.async_fire(
+            EVENT_ENTITY_REGISTRY_UPDATED, {"action": "create", "entity_id": entity_id}
+        )
+        return entry
+
+    def async_remove(self, entity_id):
+        entry = self.entities.pop(entity_id, None)
+        if entry is None:
+            return
+        self._by_unique_id.pop((entry.domain, entry.platform, entry.unique_id), None)
+        if entry.device_id:
+            self._by_device.get(entry.device_id, {}).pop(entity_id, None)
+        entity = self.platform_entities.pop(entity_id, None)
+        if entity is not None:
+            entity.hass = None
+        self.hass.bus.async_fire(
+            EVENT_ENTITY_REGISTRY_UPDATED, {"action": "remove", "entity_id": entity_id}
+        )
+
+
+def async_get_device_registry(hass):
+    if "device_registry" not in hass.data:
+        hass.data["device_registry"] = DeviceRegistry(hass)
+    return hass.data["device_registry"]
+
+
+def async_get_entity_registry(hass):
+    if "entity_registry" not in hass.data:
+        hass.data["entity_registry"] = EntityRegistry(hass)
+    return hass.data["entity_registry"]
+
+
+def async_entries_for_device(registry, device_id, include_disabled_entities=False):
+    return list(registry._by_device.get(device_id, {}).values())
+
+
+# Storage, events, entities --------------------------------------------------
+
+
+class Store:
+    def __init__(self, hass, version, key, **kwargs):
+        self.hass = hass
+        self.version = version
+        self.key = key
+        self.path = hass.config.path(".storage", key)
+        self._delay_handle = None
+
+    def _write(self, data):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(
+                {
+                    "version": self.version,
+                    "minor_version": 1,
+                    "key": self.key,
+                    "data": data,
+                },
+                file,
+            )
+        os.replace(tmp_path, self.path)
+
+    def _read(self):
+        try:
+            with open(self.path, encoding="utf-8") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    async def async_load(self):
+        data = await self.hass.async_add_executor_job(self._read)
+        return None if data is None else data["data"]
+
+    async def async_save(self, data):
+        if self._delay_handle:
+            self._delay_handle.cancel()
+            self._delay_handle = None
+            _PENDING_SAVES.pop(self, None)
+        await self.hass.async_add_executor_job(self._write, data)
+
+    def async_delay_save(self, data_func, delay=0):
+        if self._delay_handle:
+            self._delay_handle.cancel()
+
+        def _fire():
+            self._delay_handle = None
+            _PENDING_SAVES.pop(self, None)
+            self.hass.async_create_task(self.async_save(data_func()))
+
+        self._delay_handle = self.hass.loop.call_later(delay, _fire)
+        _PENDING_SAVES[self] = data_func
+
+
+# Stores with a delayed save, written early by async_final_write()
+_PENDING_SAVES = {}
+
+
+async def async_final_write(hass):
+    """Write every delayed save now, as Home Assistant does when it stops."""
+    await asyncio.gather(*hass.bus.async_fire(EVENT_HOMEASSISTANT_FINAL_WRITE))
+    for store, data_func in list(_PENDING_SAVES.items()):
+        if store.hass is hass:
+            del _PENDING_SAVES[store]
+            await store.async_save(data_func())
+
+
+def async_call_later(hass, delay, action):
+    def _fire():
+        result = action(None)
+        if asyncio.iscoroutine(result):
+            hass.async_create_task(result)
+
+    handle = hass.loop.call_later(delay, _fire)
+    return handle.cancel
+
+
+def async_track_state_change_event(hass, entity_ids, action):
+    entity_ids = {entity_ids} if isinstance(entity_ids, str) else set(entity_ids)
+
+    def _filtered(event):
+        if event.data["entity_id"] in entity_ids:
+            action(event)
+
+    return hass.bus.async_listen(EVENT_STATE_CHANGED, _filtered)
+
+
+class Entity:
+    hass = None
+    entity_id = None
+    _attr_name = None
+    _attr_unique_id = None
+    _attr_device_info = None
+
+    @property
+    def unique_id(self):
+        return self._attr_unique_id
+
+    @property
+    def name(self):
+        return self._attr_name
+
+    @property
+    def device_info(self):
+        return self._attr_device_info
+
+    @property
+    def available(self):
+        return True
+
+    def async_write_ha_state(self):
+        pass
+
+    async def async_added_to_hass(self):
+        pass
+
+    async def async_will_remove_from_hass(self):
+        pass
+
+    async def async_remove(self, *, force_remove=False):
+        await self.async_will_remove_from_hass()
+        self.hass = None
+
+
+class ButtonEntity(Entity):
+    pass
+
+
+def make_add_entities(hass, platform, domain="button"):
+    """Return an async_add_entities that registers entities like an EntityPlatform."""
+    device_registry = async_get_device_registry(hass)
+    entity_registry = async_get_entity_registry(hass)
+
+    def async_add_entities(entities, update_before_add=False):
+        for entity in entities:
+            device_id = None
+            device_info = entity.device_info
+            if device_info:
+                device_id = device_registry.async_get_or_create(
+                    identifiers=device_info["identifiers"], name=device_info.get("name")
+                ).id
+            entry = entity_registry.async_get_or_create(
+                domain, platform, entity.unique_id, device_id
+            )
+            entity.hass = hass
+            entity.entity_id = entry.entity_id
+            entity_registry.platform_entities[entry.entity_id] = entity
+            result = entity.async_added_to_hass()
+            if asyncio.iscoroutine(result):
+                hass.async_create_task(result)
+
+    return async_add_entities
+
+
+# Third-party libraries ------------------------------------------------------
+
+
+class _Observer:
+    def schedule(self, handler, path, recursive=False):
+        pass
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def join(self, timeout=None):
+        pass
+
+
+class _FileSystemEventHandler:
+    pass
+
+
+class BroadlinkException(Exception):
+    pass
+
+
+class AuthorizationError(BroadlinkException):
+    pass
+
+
+def _module(name, **attrs):
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    if "." not in name or name.count(".") < 3:
+        module.__path__ = []
+    sys.modules[name] = module
+    return module
+
+
+def install():
+    """Register the fake modules. Safe to call more than once."""
+    if getattr(sys.modules.get("homeassistant"), "__fake__", False):
+        return
+    _module("homeassistant", __fake__=True)
+    _module(
+        "homeassistant.core",
+        HomeAssistant=HomeAssistant,
+        callback=callback,
+        ServiceCall=ServiceCall,
+    )
+    _module("homeassistant.exceptions", HomeAssistantError=HomeAssistantError)
+    _module(
+        "homeassistant.const",
+        EVENT_HOMEASSISTANT_STOP=EVENT_HOMEASSISTANT_STOP,
+        EVENT_HOMEASSISTANT_FINAL_WRITE=EVENT_HOMEASSISTANT_FINAL_WRITE,
+        EVENT_STATE_CHANGED=EVENT_STATE_CHANGED,
+        STATE_UNAVAILABLE=STATE_UNAVAILABLE,
+        EntityCategory=types.SimpleNamespace(DIAGNOSTIC="diagnostic"),
+        UnitOfTime=types.SimpleNamespace(MILLISECONDS="ms"),
+    )
+    _module("homeassistant.config_entries", ConfigEntry=ConfigEntry)
+    helpers = _module("homeassistant.helpers")
+    helpers.device_registry = _module(
+        "homeassistant.helpers.device_registry",
+        async_get=async_get_device_registry,
+        CONNECTION_NETWORK_MAC=CONNECTION_NETWORK_MAC,
+        EVENT_DEVICE_REGISTRY_UPDATED=EVENT_DEVICE_REGISTRY_UPDATED,
+        DeviceEntryType=types.SimpleNamespace(SERVICE="service"),
+    )
+    helpers.entity_registry = _module(
+        "homeassistant.helpers.entity_registry",
+        async_get=async_get_entity_registry,
+        async_entries_for_device=async_entries_for_device,
+        EVENT_ENTITY_REGISTRY_UPDATED=EVENT_ENTITY_REGISTRY_UPDATED,
+    )
+    helpers.storage = _module("homeassistant.helpers.storage", Store=Store)
+    helpers.event = _module(
+        "homeassistant.helpers.event",
+        async_call_later=async_call_later,
+        async_track_state_change_event=async_track_state_change_event,
+    )
+    _module("homeassistant.components")
+    _module("homeassistant.components.button", ButtonEntity=ButtonEntity)
+
+    _module("watchdog")
+    _module("watchdog.observers", Observer=_Observer)
+    _module("watchdog.events", FileSystemEventHandler=_FileSystemEventHandler)
+
+    broadlink = _module("broadlink", gendevice=None, xdiscover=None)
+    broadlink.exceptions = _module(
+        "broadlink.exceptions",
+        BroadlinkException=BroadlinkException,
+        AuthorizationError=AuthorizationError,
+    )
+
+
+def load_integration(repo_root):
+    """Import the integration's modules without running its package __init__.
+
+    The package __init__ pulls in the config flow and service schemas, which
+    need voluptuous; the benchmarks only drive the managers and entities.
+    """
+    install()
+    package_dir = os.path.join(repo_root, "custom_components", "broadlink_manager")
+    _module("custom_components").__path__ = [
+        os.path.join(repo_root, "custom_components")
+    ]
+    package = _module("custom_components.broadlink_manager")
+    package.__path__ = [package_dir]
+    _module("custom_components.broadlink_manager.helpers").__path__ = [
+        os.path.join(package_dir, "helpers")
+    ]
+    return "custom_components.broadlink_manager"
@@ -0,0 +1,414 @@
+"""Offline benchmarks for Broadlink Manager.
+
+Runs the integration against the fake Home Assistant in fake_hass.py with
+synthetic codes files, and reports for each scenario:
+
+* load_ms: loading and indexing the codes files (DeviceManager.initialize)
+* entities_ms: creating and registering the buttons (initialize_entities)
+* reload_ms: applying a one-command edit of the codes file
+* merge_ms: merging a file edit into a pending in-process edit
+* press_p50_ms / press_p95_ms: CommandButton.async_press latency through the
+  fake remote.send_command, with a padded device/entity registry
+* search_p50_ms / search_p95_ms: CodesManager.search for "device command"
+  style queries built from random stored names
+* warm_load_ms / warm_boot_ms: DeviceManager.initialize, and the whole setup
+  up to the added buttons, after a restart with the startup snapshots saved
+* cleanup_ms: removing the hubs' devices and buttons (remove_entities)
+* bytes_per_command: memory retained after setup, per stored command
+
+Usage:
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --commands 10 1000 50000 --hubs 1 20
+    python benchmarks/run_benchmarks.py --json results.json
+"""
+
+import argparse
+import asyncio
+import base64
+import gc
+import importlib
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fake_hass  # noqa: E402
+
+PACKAGE = fake_hass.load_integration(REPO_ROOT)
+const = importlib.import_module(f"{PACKAGE}.const")
+device_manager_module = importlib.import_module(f"{PACKAGE}.device_manager")
+file_watcher_module = importlib.import_module(f"{PACKAGE}.helpers.file_watcher")
+
+DeviceManager = device_manager_module.DeviceManager
+
+COMMANDS_PER_DEVICE = 20
+DUPLICATE_RATIO = 0.2
+TOGGLE_RATIO = 0.05
+DEFAULT_MATRIX = [(10, 1), (1000, 1), (10000, 1), (50000, 1), (1000, 5), (1000, 20)]
+
+
+def make_mac(index):
+    return f"34ea34{index:06x}"
+
+
+def make_ir_code(rng):
+    """Return a base64 Broadlink IR packet with a random pulse train."""
+    pulses = bytes(rng.randrange(8, 120) for _ in range(rng.randrange(60, 200)))
+    body = pulses + b"\x0d\x05"
+    return base64.b64encode(
+        b"\x26\x00" + len(body).to_bytes(2, "little") + body
+    ).decode()
+
+
+def make_codes(commands, rng):
+    """Return a device -> command -> code mapping with commands entries."""
+    codes = {}
+    issued = []
+    for index in range(commands):
+        device_name = f"room_{index // COMMANDS_PER_DEVICE // 5}_device_{index // COMMANDS_PER_DEVICE}"
+        command_name = f"command_{index % COMMANDS_PER_DEVICE}"
+        roll = rng.random()
+        if issued and roll < DUPLICATE_RATIO:
+            code = rng.choice(issued)
+        elif roll < DUPLICATE_RATIO + TOGGLE_RATIO:
+            code = [make_ir_code(rng), make_ir_code(rng)]
+        else:
+            code = make_ir_code(rng)
+            issued.append(code)
+        codes.setdefault(device_name, {})[command_name] = code
+    return codes
+
+
+def write_codes_file(config_dir, mac, codes):
+    path = os.path.join(config_dir, ".storage", f"broadlink_remote_{mac}_codes")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(
+            {
+                "version": 1,
+                "minor_version": 1,
+                "key": os.path.basename(path),
+                "data": codes,
+            },
+            file,
+        )
+    os.replace(tmp_path, path)
+
+
+def pad_registries(hass, size):
+    """Fill the registries with unrelated devices, two entities each."""
+    device_registry = fake_hass.async_get_device_registry(hass)
+    entity_registry = fake_hass.async_get_entity_registry(hass)
+    for index in range(size):
+        device = device_registry.async_get_or_create(
+            identifiers={("zwave_js", f"node-{index}")}, name=f"Node {index}"
+        )
+        for domain in ("sensor", "switch"):
+            entity_registry.async_get_or_create(
+                domain, "zwave_js", f"node-{index}-{domain}", device.id
+            )
+
+
+def add_hub(hass, mac):
+    """Register a core Broadlink hub device with its remote entity."""
+    device = fake_hass.async_get_device_registry(hass).async_get_or_create(
+        identifiers={(const.BROADLINK_DOMAIN, mac)}, name=f"Hub {mac}"
+    )
+    entry = fake_hass.async_get_entity_registry(hass).async_get_or_create(
+        "remote", const.BROADLINK_DOMAIN, mac, device.id
+    )
+    hass.states.async_set(entry.entity_id, "idle")
+
+
+async def setup_hubs(hass, macs, entries=None):
+    """Set up one DeviceManager per hub like async_setup_entry does."""
+    managers = []
+    for index, mac in enumerate(macs):
+        if entries:
+            entry = entries[index]
+        else:
+            entry = fake_hass.ConfigEntry({"mac": mac}, title=f"Hub {mac}")
+        manager = DeviceManager(hass, mac, entry)
+        await manager.initialize()
+        hass.data.setdefault(const.DOMAIN, {})[entry.entry_id] = manager
+        managers.append(manager)
+    return managers
+
+
+async def setup_entities(hass, managers):
+    add_entities = fake_hass.make_add_entities(hass, const.DOMAIN)
+    for manager in managers:
+        await manager.initialize_entities(add_entities)
+    await hass.async_block_till_done()
+
+
+async def teardown(hass, managers):
+    for manager in managers:
+        await manager.async_shutdown()
+        await manager.codes_manager.async_shutdown()
+    await file_watcher_module.async_stop_file_watcher(hass)
+
+
+async def restart(hass, managers):
+    """Stop the managers like a Home Assistant restart and set them up again.
+
+    Returns the new managers, the time DeviceManager.initialize took and
+    the time until the buttons were added, with the startup snapshots the
+    first run left behind.
+    """
+    await hass.async_block_till_done()
+    await fake_hass.async_final_write(hass)
+    await teardown(hass, managers)
+    hass.data.pop(const.DOMAIN, None)
+    start = time.perf_counter()
+    new_managers = await setup_hubs(
+        hass,
+        [manager.mac_address for manager in managers],
+        [manager.config_entry for manager in managers],
+    )
+    load_ms = elapsed_ms(start)
+    await setup_entities(hass, new_managers)
+    return new_managers, load_ms, elapsed_ms(start)
+
+
+def elapsed_ms(start):
+    return round((time.perf_counter() - start) * 1000, 3)
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(percent / 100 * len(ordered) + 0.5) - 1))
+    return round(ordered[rank], 4)
+
+
+async def run_scenario(commands, hubs, registry_size, presses, send_latency, seed):
+    rng = random.Random(seed)
+    config_dir = tempfile.mkdtemp(prefix="broadlink_manager_bench_")
+    try:
+        hass = fake_hass.HomeAssistant(config_dir)
+        macs = [make_mac(index) for index in range(hubs)]
+        for mac in macs:
+            write_codes_file(config_dir, mac, make_codes(commands, rng))
+            add_hub(hass, mac)
+        pad_registries(hass, registry_size)
+
+        async def send_command(call):
+            if send_latency:
+                await asyncio.sleep(send_latency / 1000)
+
+        hass.services.async_register("remote", "send_command", send_command)
+
+        start = time.perf_counter()
+        managers = await setup_hubs(hass, macs)
+        load_ms = elapsed_ms(start)
+
+        start = time.perf_counter()
+        await setup_entities(hass, managers)
+        entities_ms = elapsed_ms(start)
+
+        # Add one command to the first hub's file, as an external editor would
+        manager = managers[0]
+        edited = make_codes(commands, random.Random(seed))
+        first_device = next(iter(edited))
+        edited[first_device]["benchmark_added"] = make_ir_code(rng)
+        write_codes_file(config_dir, manager.mac_address, edited)
+        start = time.perf_counter()
+        await manager.codes_manager._load_data()
+        await hass.async_block_till_done()
+        reload_ms = elapsed_ms(start)
+        assert f"{manager.mac_address}_{first_device}_benchmark_added" in (
+            manager._buttons
+        ), "reload did not add the edited command"
+
+        # Edit the file again while an in-process edit is waiting to be saved
+        codes_manager = manager.codes_manager
+        codes_manager.create_command(first_device, "benchmark_local", make_ir_code(rng))
+        edited[first_device]["benchmark_external"] = make_ir_code(rng)
+        write_codes_file(config_dir, manager.mac_address, edited)
+        start = time.perf_counter()
+        await codes_manager._load_data()
+        await hass.async_block_till_done()
+        merge_ms = elapsed_ms(start)
+        assert {"benchmark_local", "benchmark_external"} <= set(
+            codes_manager.get_device_codes(first_device)
+        ), "merge lost an edit"
+        await codes_manager.save_data()
+
+        buttons = [
+            button for manager in managers for button in manager._buttons.values()
+        ]
+        latencies = []
+        for _ in range(presses):
+            button = rng.choice(buttons)
+            start = time.perf_counter()
+            await button.async_press()
+            latencies.append((time.perf_counter() - start) * 1000)
+        if hass.services.calls != presses:
+            raise RuntimeError(
+                f"expected {presses} remote.send_command calls, got {hass.services.calls}"
+            )
+
+        codes_managers = {
+            manager.mac_address: manager.codes_manager for manager in managers
+        }
+        search_latencies = []
+        for _ in range(presses):
+            button = rng.choice(buttons)
+            query = f"{button.device_name.split('_', 2)[-1]} {button.command_name}"
+            codes_manager = codes_managers[button.unique_id.split("_", 1)[0]]
+            start = time.perf_counter()
+            codes_manager.search(query)
+            search_latencies.append((time.perf_counter() - start) * 1000)
+
+        managers, warm_load_ms, warm_boot_ms = await restart(hass, managers)
+        restarted = sum(len(manager._buttons) for manager in managers)
+        assert restarted == len(buttons), "restart did not restore every button"
+        # The codes are still parsed in the background for sending
+        for manager in managers:
+            await manager.codes_manager.async_wait_loaded()
+
+        start = time.perf_counter()
+        for manager in managers:
+            await manager.remove_entities()
+        cleanup_ms = elapsed_ms(start)
+        entity_registry = fake_hass.async_get_entity_registry(hass)
+        assert not any(
+            entry.platform == const.DOMAIN
+            for entry in entity_registry.entities.values()
+        ), "cleanup left buttons behind"
+
+        await teardown(hass, managers)
+    finally:
+        shutil.rmtree(config_dir, ignore_errors=True)
+
+    return {
+        "commands_per_hub": commands,
+        "hubs": hubs,
+        "buttons": len(buttons),
+        "load_ms": load_ms,
+        "entities_ms": entities_ms,
+        "reload_ms": reload_ms,
+        "merge_ms": merge_ms,
+        "press_p50_ms": percentile(latencies, 50),
+        "press_p95_ms": percentile(latencies, 95),
+        "search_p50_ms": percentile(search_latencies, 50),
+        "search_p95_ms": percentile(search_latencies, 95),
+        "warm_load_ms": warm_load_ms,
+        "warm_boot_ms": warm_boot_ms,
+        "cleanup_ms": cleanup_ms,
+    }
+
+
+async def measure_memory(commands, hubs, seed):
+    """Return the bytes retained by the integration per stored command."""
+    rng = random.Random(seed)
+    config_dir = tempfile.mkdtemp(prefix="broadlink_manager_bench_")
+    try:
+        hass = fake_hass.HomeAssistant(config_dir)
+        macs = [make_mac(index) for index in range(hubs)]
+        for mac in macs:
+            write_codes_file(config_dir, mac, make_codes(commands, rng))
+            add_hub(hass, mac)
+        gc.collect()
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        managers = await setup_hubs(hass, macs)
+        codes_bytes = tracemalloc.get_traced_memory()[0] - baseline
+        await setup_entities(hass, managers)
+        gc.collect()
+        total_bytes = tracemalloc.get_traced_memory()[0] - baseline
+        tracemalloc.stop()
+        await teardown(hass, managers)
+    finally:
+        shutil.rmtree(config_dir, ignore_errors=True)
+
+    stored = commands * hubs
+    return {
+        "codes_bytes_per_command": round(codes_bytes / stored),
+        "bytes_per_command": round(total_bytes / stored),
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--commands", type=int, nargs="+", help="commands per hub (10 to 50000)"
+    )
+    parser.add_argument("--hubs", type=int, nargs="+", help="number of hubs (1 to 20)")
+    parser.add_argument(
+        "--registry-size",
+        type=int,
+        default=5000,
+        help="unrelated devices in the registry, two entities each",
+    )
+    parser.add_argument("--presses", type=int, default=500)
+    parser.add_argument(
+        "--send-latency",
+        type=float,
+        default=0.0,
+        help="simulated remote.send_command latency in ms",
+    )
+    parser.add_argument("--no-memory", action="store_true")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+    if args.commands or args.hubs:
+        args.matrix = [
+            (commands, hubs)
+            for commands in args.commands or [1000]
+            for hubs in args.hubs or [1]
+        ]
+    else:
+        args.matrix = DEFAULT_MATRIX
+    return args
+
+
+def print_table(results):
+    columns = list(results[0])
+    widths = [
+        max(len(column), *(len(str(row.get(column, ""))) for row in results))
+        for column in columns
+    ]
+    print("  ".join(column.rjust(width) for column, width in zip(columns, widths)))
+    for row in results:
+        print(
+            "  ".join(
+                str(row.get(column, "")).rjust(width)
+                for column, width in zip(columns, widths)
+            )
+        )
+
+
+async def main(args):
+    results = []
+    for commands, hubs in args.matrix:
+        result = await run_scenario(
+            commands,
+            hubs,
+            args.registry_size,
+            args.presses,
+            args.send_latency,
+            args.seed,
+        )
+        if not args.no_memory:
+            result.update(await measure_memory(commands, hubs, args.seed))
+        results.append(result)
+        print(f"{commands} commands x {hubs} hubs done", file=sys.stderr, flush=True)
+    print_table(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(main(parse_args()))
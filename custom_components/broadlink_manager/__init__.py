@@ -1,11 +1,17 @@
 import logging
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
+from .broadlink_hub import async_stop_hub_registry
 from .device_manager import DeviceManager
 from .const import DOMAIN
+from .helpers.file_watcher import async_stop_file_watcher
+from .services import async_setup_services, async_unload_services
+from .websocket import async_setup_websocket
 
 _LOGGER = logging.getLogger(__name__)
 
+PLATFORMS = ["button", "sensor"]
+
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
     """Set up Broadlink Manager from a config entry."""
@@ -15,20 +21,47 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
     if DOMAIN not in hass.data:
         hass.data[DOMAIN] = {}
     hass.data[DOMAIN][entry.entry_id] = device_manager
+    async_setup_services(hass)
+    async_setup_websocket(hass)
+    entry.async_on_unload(entry.add_update_listener(async_reload_entry))
 
-    # Forward entry setup to the button platform
-    await hass.config_entries.async_forward_entry_setup(entry, "button")
+    # Forward entry setup to the button and diagnostic sensor platforms
+    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
     return True
 
 
+async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry):
+    """Reload the entry after its options changed."""
+    await hass.config_entries.async_reload(entry.entry_id)
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry):
     """Unload a config entry."""
     _LOGGER.debug("Unloading Broadlink Manager for entry: %s", entry.title)
 
-    await hass.config_entries.async_forward_entry_unload(entry, "button")
+    if not await hass.config_entries.async_unload_platforms(entry, PLATFORMS):
+        return False
 
     device_manager = hass.data[DOMAIN].pop(entry.entry_id, None)
     if device_manager:
         await device_manager.remove_entities()
+        await device_manager.async_shutdown()
+
+        # Release the codes manager once no other entry uses the same hub
+        if not any(
+            isinstance(other, DeviceManager)
+            and other.mac_address == device_manager.mac_address
+            for other in hass.data[DOMAIN].values()
+        ):
+            codes_manager = hass.data[DOMAIN].pop(device_manager.mac_address, None)
+            if codes_manager:
+                await codes_manager.async_shutdown()
+
+    await async_stop_file_watcher(hass, only_if_idle=True)
+    if not any(
+        isinstance(other, DeviceManager) for other in hass.data[DOMAIN].values()
+    ):
+        async_stop_hub_registry(hass)
+        async_unload_services(hass)
 
     return True
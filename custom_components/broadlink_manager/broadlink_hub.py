@@ -1,36 +1,325 @@
+import asyncio
 import broadlink
 import logging
-from homeassistant.helpers import device_registry as dr
+import time
+from broadlink.exceptions import BroadlinkException
+from homeassistant.const import STATE_UNAVAILABLE
+from homeassistant.core import callback
+from homeassistant.helpers import device_registry as dr, entity_registry as er
+from homeassistant.helpers.event import async_track_state_change_event
+from .const import (
+    BROADLINK_DOMAIN,
+    DATA_DISCOVERY_CACHE,
+    DATA_HUB_REGISTRY,
+    DISCOVERY_BROADCAST_ADDRESS,
+    DISCOVERY_CACHE_TTL,
+    DISCOVERY_TIMEOUT,
+)
+from .helpers.utils import normalize_mac
 
 _LOGGER = logging.getLogger(__name__)
 
 
 class BroadlinkHub:
     @staticmethod
-    async def discover_devices(hass):
-        """Discover Broadlink devices."""
-        devices = broadlink.discover(timeout=5)
+    async def discover_devices(
+        hass,
+        discover_ip_addresses=None,
+        local_ip_addresses=None,
+        timeout=DISCOVERY_TIMEOUT,
+        use_cache=True,
+    ):
+        """Discover Broadlink devices, reusing results younger than the cache TTL."""
+        cache = hass.data.setdefault(DATA_DISCOVERY_CACHE, {})
+        cache_key = (
+            tuple(discover_ip_addresses or ()),
+            tuple(local_ip_addresses or ()),
+        )
+        cached = cache.get(cache_key)
+        if use_cache and cached and time.monotonic() - cached[0] < DISCOVERY_CACHE_TTL:
+            return list(cached[1])
+
+        devices = [
+            device
+            async for device in BroadlinkHub.async_stream_devices(
+                hass, discover_ip_addresses, local_ip_addresses, timeout
+            )
+        ]
+        cache[cache_key] = (time.monotonic(), devices)
         _LOGGER.debug("Network-discovered devices: %s", devices)
-        return devices
+        return list(devices)
+
+    @staticmethod
+    async def async_stream_devices(
+        hass,
+        discover_ip_addresses=None,
+        local_ip_addresses=None,
+        timeout=DISCOVERY_TIMEOUT,
+    ):
+        """Yield Broadlink devices as they answer.
+
+        Every (local interface, broadcast/target address) pair is scanned in
+        its own executor thread, so several subnets are probed in parallel
+        and the event loop is never blocked by the socket reads.
+        """
+        targets = [
+            (local_ip, discover_ip)
+            for local_ip in (local_ip_addresses or [None])
+            for discover_ip in (discover_ip_addresses or [DISCOVERY_BROADCAST_ADDRESS])
+        ]
+        queue = asyncio.Queue()
+        finished = object()
+
+        def _scan(local_ip, discover_ip):
+            try:
+                for device in broadlink.xdiscover(
+                    timeout=timeout,
+                    local_ip_address=local_ip,
+                    discover_ip_address=discover_ip,
+                ):
+                    hass.loop.call_soon_threadsafe(queue.put_nowait, device)
+            except (OSError, BroadlinkException) as err:
+                _LOGGER.warning(
+                    "Discovery via %s on %s failed: %s",
+                    discover_ip,
+                    local_ip or "all interfaces",
+                    err,
+                )
+            finally:
+                hass.loop.call_soon_threadsafe(queue.put_nowait, finished)
+
+        scans = [
+            hass.async_add_executor_job(_scan, local_ip, discover_ip)
+            for local_ip, discover_ip in targets
+        ]
+        seen = set()
+        pending = len(scans)
+        try:
+            while pending:
+                device = await queue.get()
+                if device is finished:
+                    pending -= 1
+                    continue
+                if device.mac in seen:
+                    continue
+                seen.add(device.mac)
+                yield device
+        finally:
+            # Scans keep running until their timeout if the consumer stops early
+            for scan in scans:
+                scan.add_done_callback(lambda fut: fut.cancelled() or fut.exception())
 
     @staticmethod
     def find_registered_devices(hass):
         """Find Broadlink devices in the Home Assistant device registry."""
-        device_registry = dr.async_get(hass)
-        devices = []
-
-        for device_entry in device_registry.devices.values():
-            _LOGGER.debug(f"Device Entry: {device_entry.identifiers}")
-            for identifier in device_entry.identifiers:
-                if "broadlink" in identifier[0]:
-                    _LOGGER.debug(f"Broadlink Device Found: {device_entry.name}")
-                    devices.append(
-                        {
-                            "name": device_entry.name
-                            or identifier[1],  # Use MAC if no name
-                            "id": device_entry.id,
-                            "mac_address": identifier[1],  # Capture the MAC address
-                        }
-                    )
-
-        return devices
+        return [
+            {"name": hub.name, "id": hub.device_id, "mac_address": hub.mac_address}
+            for hub in async_get_hub_registry(hass).hubs()
+        ]
+
+
+class HubInfo:
+    """A Broadlink hub from the device registry."""
+
+    __slots__ = ("mac_address", "name", "device_id", "remote_entity_id", "online")
+
+    def __init__(self, mac_address, name, device_id):
+        self.mac_address = mac_address  # Canonical: lowercase hex, no separators
+        self.name = name
+        self.device_id = device_id
+        self.remote_entity_id = None
+        self.online = False
+
+
+class HubRegistry:
+    """The Broadlink hubs known to Home Assistant, kept current by events.
+
+    The registries are scanned once; after that device and entity registry
+    events update single hubs and state changes of their remote entities
+    update the online flag, so every lookup is a dict access.
+    """
+
+    def __init__(self, hass):
+        self.hass = hass
+        self._hubs = {}  # MAC -> HubInfo
+        self._device_macs = {}  # device registry id -> MAC
+        self._remote_macs = {}  # remote entity_id -> MAC
+        self._listeners = {}  # MAC -> set of callbacks for online changes
+        self._unsub = []
+        self._unsub_state = None
+        self._tracked = frozenset()  # remote entity_ids with a state listener
+
+    @callback
+    def async_setup(self):
+        for device_entry in dr.async_get(self.hass).devices.values():
+            self._index_device(device_entry)
+        self._unsub = [
+            self.hass.bus.async_listen(
+                dr.EVENT_DEVICE_REGISTRY_UPDATED, self._async_device_registry_updated
+            ),
+            self.hass.bus.async_listen(
+                er.EVENT_ENTITY_REGISTRY_UPDATED, self._async_entity_registry_updated
+            ),
+        ]
+        self._track_remotes()
+        _LOGGER.debug("Hub registry found: %s", list(self._hubs))
+
+    @callback
+    def async_shutdown(self):
+        for unsub in self._unsub:
+            unsub()
+        self._unsub = []
+        if self._unsub_state:
+            self._unsub_state()
+            self._unsub_state = None
+        self._tracked = frozenset()
+
+    @callback
+    def async_get(self, mac_address):
+        """Return the HubInfo for a MAC in any notation, or None."""
+        return self._hubs.get(normalize_mac(mac_address))
+
+    @callback
+    def hubs(self):
+        return list(self._hubs.values())
+
+    @callback
+    def async_add_listener(self, mac_address, listener):
+        """Call listener() when the hub's online state changes."""
+        listeners = self._listeners.setdefault(normalize_mac(mac_address), set())
+        listeners.add(listener)
+        return lambda: listeners.discard(listener)
+
+    def _index_device(self, device_entry):
+        self._drop_device(device_entry.id)
+        mac_address = next(
+            (
+                normalize_mac(identifier[1])
+                for identifier in device_entry.identifiers
+                if identifier[0] == BROADLINK_DOMAIN
+            ),
+            None,
+        )
+        if mac_address is None:
+            return
+        hub = HubInfo(
+            mac_address,
+            device_entry.name_by_user or device_entry.name or mac_address,
+            device_entry.id,
+        )
+        self._hubs[mac_address] = hub
+        self._device_macs[device_entry.id] = mac_address
+        for entity_entry in er.async_entries_for_device(
+            er.async_get(self.hass), device_entry.id
+        ):
+            if entity_entry.domain == "remote":
+                self._set_remote(hub, entity_entry.entity_id)
+                break
+
+    def _drop_device(self, device_id):
+        mac_address = self._device_macs.pop(device_id, None)
+        hub = self._hubs.pop(mac_address, None)
+        if hub is not None and hub.remote_entity_id:
+            self._remote_macs.pop(hub.remote_entity_id, None)
+            self._track_remotes()
+
+    def _set_remote(self, hub, entity_id):
+        if hub.remote_entity_id:
+            self._remote_macs.pop(hub.remote_entity_id, None)
+        hub.remote_entity_id = entity_id
+        if entity_id:
+            self._remote_macs[entity_id] = hub.mac_address
+        self._track_remotes()
+        state = entity_id and self.hass.states.get(entity_id)
+        self._set_online(hub, bool(state) and state.state != STATE_UNAVAILABLE)
+
+    def _track_remotes(self):
+        """Listen to state changes of exactly the current remote entities."""
+        if not self._unsub or self._tracked == self._remote_macs.keys():
+            # Not set up yet (async_setup subscribes once after the scan)
+            # or the set of remote entities did not change
+            return
+        if self._unsub_state:
+            self._unsub_state()
+            self._unsub_state = None
+        self._tracked = frozenset(self._remote_macs)
+        if self._tracked:
+            self._unsub_state = async_track_state_change_event(
+                self.hass, list(self._tracked), self._async_state_changed
+            )
+
+    def _set_online(self, hub, online):
+        if hub.online == online:
+            return
+        hub.online = online
+        _LOGGER.debug(
+            "Hub %s is %s", hub.mac_address, "online" if online else "offline"
+        )
+        for listener in list(self._listeners.get(hub.mac_address, ())):
+            listener()
+
+    @callback
+    def _async_device_registry_updated(self, event):
+        device_id = event.data["device_id"]
+        device_entry = dr.async_get(self.hass).async_get(device_id)
+        if event.data["action"] == "remove" or device_entry is None:
+            mac_address = self._device_macs.get(device_id)
+            self._drop_device(device_id)
+            if mac_address:
+                self._notify_offline(mac_address)
+            return
+        if device_id in self._device_macs or any(
+            identifier[0] == BROADLINK_DOMAIN for identifier in device_entry.identifiers
+        ):
+            self._index_device(device_entry)
+
+    @callback
+    def _async_entity_registry_updated(self, event):
+        for entity_id in (event.data.get("old_entity_id"), event.data["entity_id"]):
+            if not entity_id or not entity_id.startswith("remote."):
+                continue
+            mac_address = self._remote_macs.get(entity_id)
+            if mac_address:
+                self._set_remote(self._hubs[mac_address], None)
+        entity_id = event.data["entity_id"]
+        if event.data["action"] == "remove" or not entity_id.startswith("remote."):
+            return
+        entity_entry = er.async_get(self.hass).async_get(entity_id)
+        if entity_entry is None:
+            return
+        mac_address = self._device_macs.get(entity_entry.device_id)
+        if mac_address:
+            self._set_remote(self._hubs[mac_address], entity_id)
+
+    @callback
+    def _async_state_changed(self, event):
+        mac_address = self._remote_macs.get(event.data["entity_id"])
+        if mac_address is None:
+            return
+        new_state = event.data.get("new_state")
+        self._set_online(
+            self._hubs[mac_address],
+            new_state is not None and new_state.state != STATE_UNAVAILABLE,
+        )
+
+    def _notify_offline(self, mac_address):
+        for listener in list(self._listeners.get(mac_address, ())):
+            listener()
+
+
+@callback
+def async_get_hub_registry(hass):
+    """Return the shared hub registry, building it on first use."""
+    hub_registry = hass.data.get(DATA_HUB_REGISTRY)
+    if hub_registry is None:
+        hub_registry = hass.data[DATA_HUB_REGISTRY] = HubRegistry(hass)
+        hub_registry.async_setup()
+    return hub_registry
+
+
+@callback
+def async_stop_hub_registry(hass):
+    """Unsubscribe and drop the shared hub registry, if it was built."""
+    hub_registry = hass.data.pop(DATA_HUB_REGISTRY, None)
+    if hub_registry is not None:
+        hub_registry.async_shutdown()
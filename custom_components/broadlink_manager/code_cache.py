@@ -0,0 +1,302 @@
+import hashlib
+import logging
+import sys
+import zlib
+from .const import DATA_CODE_POOL, DEDUP_REPORT_LIMIT
+from .helpers.utils import decode_code
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class CodeRecord:
+    """A stored command, pointing at its decoded code by content hash."""
+
+    __slots__ = ("device_name", "command_name", "digest")
+
+    def __init__(self, device_name, command_name, digest):
+        self.device_name = device_name
+        self.command_name = command_name
+        self.digest = digest
+
+
+class CodePool:
+    """Decoded codes addressed by content hash, each distinct code held once.
+
+    The pool is shared by the code caches of all hubs, so a library copied
+    to several hubs is kept in memory once. Every reference is counted and a
+    payload is dropped when its last command is deleted or changed.
+    """
+
+    def __init__(self):
+        self._payloads = {}  # digest -> bytes | tuple of bytes
+        self._refcounts = {}  # digest -> number of records using it
+
+    def __len__(self):
+        return len(self._payloads)
+
+    def get(self, digest):
+        return self._payloads.get(digest)
+
+    def acquire(self, code):
+        """Decode code, add a reference to it and return its digest."""
+        payload = self._decode(code)
+        if payload is None:
+            return None
+        digest = self.digest(payload)
+        self.acquire_payload(digest, payload)
+        return digest
+
+    def acquire_payload(self, digest, payload, count=1):
+        if digest in self._refcounts:
+            self._refcounts[digest] += count
+        else:
+            self._payloads[digest] = payload
+            self._refcounts[digest] = count
+
+    def release(self, digest, count=1):
+        if digest is None:
+            return
+        self._refcounts[digest] -= count
+        if not self._refcounts[digest]:
+            del self._refcounts[digest]
+            del self._payloads[digest]
+
+    def merge(self, other):
+        """Move every reference held in another pool into this one."""
+        for digest, payload in other._payloads.items():
+            self.acquire_payload(digest, payload, other._refcounts[digest])
+        other._payloads = {}
+        other._refcounts = {}
+
+    def memory_usage(self):
+        payload_bytes = sum(
+            payload_size(payload, sys.getsizeof) for payload in self._payloads.values()
+        )
+        return {
+            "unique_codes": len(self._payloads),
+            "references": sum(self._refcounts.values()),
+            "payload_bytes": payload_bytes,
+        }
+
+    @staticmethod
+    def digest(payload):
+        if isinstance(payload, tuple):
+            return hashlib.blake2b(
+                b"".join(len(part).to_bytes(4, "big") + part for part in payload),
+                digest_size=16,
+                person=b"toggle",
+            ).digest()
+        return hashlib.blake2b(payload, digest_size=16).digest()
+
+    @staticmethod
+    def _decode(code):
+        try:
+            if isinstance(code, list):
+                return tuple(decode_code(part) for part in code)
+            return decode_code(code)
+        except (TypeError, ValueError):
+            _LOGGER.warning("Ignoring invalid code: %r", code)
+            return None
+
+
+def get_code_pool(hass):
+    """Return the code pool shared by every CodesManager."""
+    pool = hass.data.get(DATA_CODE_POOL)
+    if pool is None:
+        pool = hass.data[DATA_CODE_POOL] = CodePool()
+    return pool
+
+
+def payload_size(payload, size=len):
+    if isinstance(payload, tuple):
+        return sum(size(part) for part in payload)
+    return size(payload)
+
+
+class CodeCache:
+    """Decoded codes of one hub, stored in a CodePool.
+
+    Codes are decoded from base64 a single time when they are loaded or
+    changed. A cache built in the executor uses a private pool; attach()
+    then moves its references into the shared pool on the event loop.
+    Toggle codes (a list of codes) are kept as a tuple.
+    """
+
+    def __init__(self, pool=None):
+        self._records = {}  # device -> {command -> CodeRecord}
+        self._pool = pool if pool is not None else CodePool()
+
+    def build(self, codes):
+        """Fill an empty cache with the device -> command -> code mapping."""
+        for device_name, commands in codes.items():
+            self.add_device(device_name)
+            for command_name, code in commands.items():
+                self.set(device_name, command_name, code)
+
+    def attach(self, pool):
+        """Move this cache's references into pool (usually the shared one)."""
+        if pool is not self._pool:
+            pool.merge(self._pool)
+            self._pool = pool
+
+    def detach(self):
+        """Release every reference this cache holds in its pool."""
+        for commands in self._records.values():
+            for record in commands.values():
+                self._pool.release(record.digest)
+        self._records = {}
+
+    def records(self):
+        """Yield every CodeRecord."""
+        for commands in self._records.values():
+            yield from commands.values()
+
+    def add_device(self, device_name):
+        self._records.setdefault(sys.intern(device_name), {})
+
+    def set(self, device_name, command_name, code):
+        device_name = sys.intern(device_name)
+        command_name = sys.intern(command_name)
+        commands = self._records.setdefault(device_name, {})
+        old_record = commands.get(command_name)
+        digest = self._pool.acquire(code)
+        commands[command_name] = CodeRecord(device_name, command_name, digest)
+        if old_record is not None:
+            self._pool.release(old_record.digest)
+
+    def get(self, device_name, command_name):
+        """Return the decoded code (bytes, or a tuple for toggles), or None."""
+        record = self._records.get(device_name, {}).get(command_name)
+        if record is None:
+            return None
+        return self._pool.get(record.digest)
+
+    def remove(self, device_name, command_name):
+        record = self._records.get(device_name, {}).pop(command_name, None)
+        if record is not None:
+            self._pool.release(record.digest)
+
+    def remove_device(self, device_name):
+        for record in self._records.pop(device_name, {}).values():
+            self._pool.release(record.digest)
+
+    def rename_device(self, old_name, new_name):
+        if old_name not in self._records:
+            return
+        new_name = sys.intern(new_name)
+        self.remove_device(new_name)
+        commands = self._records.pop(old_name)
+        for record in commands.values():
+            record.device_name = new_name
+        self._records[new_name] = commands
+
+    def rename_command(self, device_name, old_command, new_command):
+        commands = self._records.get(device_name, {})
+        record = commands.pop(old_command, None)
+        if record is None:
+            return
+        new_command = sys.intern(new_command)
+        replaced = commands.get(new_command)
+        if replaced is not None:
+            self._pool.release(replaced.digest)
+        record.command_name = new_command
+        commands[new_command] = record
+
+    def memory_usage(self):
+        """Approximate memory held by the cache, in bytes.
+
+        Payloads are counted once per distinct code of this hub, even when
+        the shared pool also holds them for other hubs.
+        """
+        record_count = sum(len(commands) for commands in self._records.values())
+        record_bytes = sum(
+            sys.getsizeof(commands)
+            + sum(sys.getsizeof(record) for record in commands.values())
+            for commands in self._records.values()
+        )
+        digests = {record.digest for record in self.records()}
+        digests.discard(None)
+        payload_bytes = sum(
+            payload_size(self._pool.get(digest), sys.getsizeof) for digest in digests
+        )
+        index_bytes = sys.getsizeof(self._records)
+        return {
+            "devices": len(self._records),
+            "commands": record_count,
+            "unique_codes": len(digests),
+            "record_bytes": record_bytes,
+            "payload_bytes": payload_bytes,
+            "total_bytes": record_bytes + payload_bytes + index_bytes,
+        }
+
+
+def build_dedup_report(payloads, locations):
+    """Describe duplicate and near-duplicate codes. Blocking.
+
+    payloads maps digests to decoded codes and locations lists
+    (digest, mac, device, command) for every stored command.
+    Near-duplicates are IR/RF packets whose pulse trains are equal but
+    whose repeat byte (the second byte of the packet) differs.
+    """
+    by_digest = {}
+    for digest, mac_address, device_name, command_name in locations:
+        if digest is not None:
+            by_digest.setdefault(digest, []).append(
+                f"{mac_address}/{device_name}/{command_name}"
+            )
+
+    stored_bytes = 0
+    pooled_bytes = 0
+    duplicates = []
+    trains = {}
+    for digest, places in by_digest.items():
+        payload = payloads[digest]
+        size = payload_size(payload)
+        stored_bytes += size * len(places)
+        pooled_bytes += size
+        if len(places) > 1:
+            duplicates.append(
+                {
+                    "bytes": size,
+                    "count": len(places),
+                    "bytes_saved": size * (len(places) - 1),
+                    "locations": places,
+                }
+            )
+        if isinstance(payload, bytes) and len(payload) > 2:
+            train = payload[:1] + b"\x00" + payload[2:]
+            trains.setdefault(train, []).append((payload[1], places))
+
+    near_duplicates = [
+        {
+            "bytes": len(train),
+            "repeat_counts": sorted(repeats for repeats, _ in variants),
+            "locations": [place for _, places in variants for place in places],
+        }
+        for train, variants in trains.items()
+        if len(variants) > 1
+    ]
+    duplicates.sort(key=lambda item: item["bytes_saved"], reverse=True)
+    near_duplicates.sort(key=lambda item: len(item["locations"]), reverse=True)
+
+    unique_payloads = [payloads[digest] for digest in by_digest]
+    compressed_bytes = len(
+        zlib.compress(
+            b"".join(
+                b"".join(payload) if isinstance(payload, tuple) else payload
+                for payload in unique_payloads
+            )
+        )
+    )
+    return {
+        "commands": len(locations),
+        "unique_codes": len(by_digest),
+        "stored_bytes": stored_bytes,
+        "pooled_bytes": pooled_bytes,
+        "bytes_saved": stored_bytes - pooled_bytes,
+        "compressed_bytes": compressed_bytes,
+        "duplicate_groups": len(duplicates),
+        "near_duplicate_groups": len(near_duplicates),
+        "duplicates": duplicates[:DEDUP_REPORT_LIMIT],
+        "near_duplicates": near_duplicates[:DEDUP_REPORT_LIMIT],
+    }
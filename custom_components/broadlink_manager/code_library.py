@@ -0,0 +1,386 @@
+"""Streaming import and export of IR/RF code libraries.
+
+Supported formats:
+
+* broadlink: the device -> command -> base64 mapping used by the core
+  Broadlink integration, with or without the .storage envelope
+* smartir: a SmartIR device file; nested command groups are flattened into
+  command names joined with "_" (e.g. cool_auto_16)
+* pronto: one "device/command: 0000 006D ..." line per code
+* raw: one "device/command: 9000,-4500,560,..." line per code, in
+  microseconds with marks positive and spaces negative
+
+Files are read and written in chunks in the executor, so a library never
+has to be held in memory as text or as a parsed document.
+"""
+
+import base64
+import binascii
+import json
+import re
+from .const import CODE_LIBRARY_CHUNK_SIZE
+from .helpers.utils import decode_code
+
+FORMAT_BROADLINK = "broadlink"
+FORMAT_SMARTIR = "smartir"
+FORMAT_PRONTO = "pronto"
+FORMAT_RAW = "raw"
+FORMATS = (FORMAT_BROADLINK, FORMAT_SMARTIR, FORMAT_PRONTO, FORMAT_RAW)
+
+# python-broadlink's pulse unit, in microseconds
+BROADLINK_TICK = 32.84
+IR_PACKET_TYPE = 0x26
+RF_PACKET_TYPES = (0xB2, 0xD7)
+# Pronto carrier unit, in microseconds per unit of the frequency word
+PRONTO_CLOCK = 0.241246
+PRONTO_DEFAULT_FREQUENCY_WORD = 0x006D  # 38 kHz
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_PRONTO_CODE = re.compile(r"^[0-9a-fA-F]{4}( +[0-9a-fA-F]{4})+$")
+_RAW_CODE = re.compile(r"^[+-]?\d+([ ,]+[+-]?\d+)+$")
+_LINE = re.compile(r"^\s*([^:=]+?)\s*[:=]\s*(.+?)\s*$")
+
+
+class CodeLibraryError(ValueError):
+    """A code library file or code could not be parsed."""
+
+
+# Code conversion ------------------------------------------------------------
+
+
+def pulses_to_packet(pulses):
+    """Encode mark/space durations (microseconds) as a Broadlink IR packet.
+
+    Durations are rounded to the nearest tick like python-broadlink does.
+    A pulse shorter than half a tick still takes one tick, as a zero byte
+    would announce a 2-byte value.
+    """
+    payload = bytearray()
+    for pulse in pulses:
+        ticks = max(1, round(abs(pulse) / BROADLINK_TICK))
+        if ticks > 0xFFFF:
+            raise CodeLibraryError(f"Pulse of {pulse} us is too long")
+        if ticks > 0xFF:
+            payload += b"\x00" + ticks.to_bytes(2, "big")
+        else:
+            payload.append(ticks)
+    if not payload:
+        raise CodeLibraryError("Code has no pulses")
+    return bytes([IR_PACKET_TYPE, 0]) + len(payload).to_bytes(2, "little") + payload
+
+
+def packet_to_pulses(packet):
+    """Decode a Broadlink IR packet into pulse durations in microseconds."""
+    if packet[0] != IR_PACKET_TYPE:
+        raise CodeLibraryError("Only IR codes can be converted to pulses")
+    end = 4 + int.from_bytes(packet[2:4], "little")
+    pulses = []
+    index = 4
+    while index < end:
+        ticks = packet[index]
+        index += 1
+        if ticks == 0:
+            ticks = int.from_bytes(packet[index : index + 2], "big")
+            index += 2
+        pulses.append(int(ticks * BROADLINK_TICK))
+    return pulses
+
+
+def _encode_pulses(pulses):
+    """Encode pulses, checking that the base64 code decodes back to them."""
+    packet = pulses_to_packet(pulses)
+    decoded = packet_to_pulses(decode_code(base64.b64encode(packet).decode("ascii")))
+    if len(decoded) != len(pulses) or any(
+        abs(duration - abs(pulse)) > BROADLINK_TICK
+        for duration, pulse in zip(decoded, pulses)
+    ):
+        raise CodeLibraryError("Code does not survive the conversion to a packet")
+    return packet
+
+
+def pronto_to_pulses(pronto):
+    """Return the pulse durations of a learned (0000) Pronto code."""
+    try:
+        words = [int(word, 16) for word in pronto.split()]
+    except ValueError as err:
+        raise CodeLibraryError(f"Invalid Pronto code: {err}") from err
+    if len(words) < 6 or words[0] != 0 or not words[1]:
+        raise CodeLibraryError("Only learned Pronto codes (0000 ...) are supported")
+    period = words[1] * PRONTO_CLOCK
+    pairs = (words[2] + words[3]) * 2
+    durations = words[4 : 4 + pairs]
+    if len(durations) != pairs:
+        raise CodeLibraryError("Pronto code is shorter than its header says")
+    return [round(duration * period) for duration in durations]
+
+
+def pulses_to_pronto(pulses):
+    period = PRONTO_DEFAULT_FREQUENCY_WORD * PRONTO_CLOCK
+    durations = [max(1, round(pulse / period)) for pulse in pulses]
+    if len(durations) % 2:
+        durations.append(durations[-1])
+    words = [0, PRONTO_DEFAULT_FREQUENCY_WORD, len(durations) // 2, 0] + durations
+    return " ".join(f"{word:04X}" for word in words)
+
+
+def validate_packet(packet):
+    """Raise CodeLibraryError unless packet is a well-formed Broadlink packet."""
+    if len(packet) < 5:
+        raise CodeLibraryError("Code is too short")
+    if packet[0] != IR_PACKET_TYPE and packet[0] not in RF_PACKET_TYPES:
+        raise CodeLibraryError(f"Unknown packet type 0x{packet[0]:02x}")
+    length = int.from_bytes(packet[2:4], "little")
+    if not 0 < length <= len(packet) - 4:
+        raise CodeLibraryError("Packet length does not match its header")
+
+
+def normalize_code(code, encoding=None):
+    """Return code as a canonical base64 Broadlink code (a list for toggles).
+
+    encoding is "base64", "pronto" or "raw"; without it the encoding is
+    detected from the value.
+    """
+    if isinstance(code, list) and code and all(isinstance(part, str) for part in code):
+        # Toggle: several codes sent in turn
+        return [normalize_code(part, encoding) for part in code]
+    if isinstance(code, list):
+        if not all(isinstance(pulse, (int, float)) for pulse in code):
+            raise CodeLibraryError("Raw codes must be lists of numbers")
+        packet = _encode_pulses(code)
+    elif not isinstance(code, str) or not code.strip():
+        raise CodeLibraryError(f"Unsupported code value: {code!r}")
+    else:
+        code = code.strip()
+        if encoding is None:
+            if _PRONTO_CODE.match(code):
+                encoding = "pronto"
+            elif _RAW_CODE.match(code):
+                encoding = "raw"
+            else:
+                encoding = "base64"
+        if encoding == "pronto":
+            packet = _encode_pulses(pronto_to_pulses(code))
+        elif encoding == "raw":
+            try:
+                pulses = [float(pulse) for pulse in re.split(r"[ ,]+", code)]
+            except ValueError as err:
+                raise CodeLibraryError(f"Invalid raw code: {err}") from err
+            packet = _encode_pulses(pulses)
+        else:
+            try:
+                packet = decode_code(code)
+            except (binascii.Error, ValueError) as err:
+                raise CodeLibraryError(f"Invalid base64 code: {err}") from err
+    validate_packet(packet)
+    return base64.b64encode(packet).decode("ascii")
+
+
+# Reading --------------------------------------------------------------------
+
+
+class JsonStream:
+    """Walk a JSON document read from a file in chunks.
+
+    leaves() yields (path, value) for every value that is not an object,
+    descending into objects, so only one leaf value and one chunk of text
+    are held at a time.
+    """
+
+    def __init__(self, file, chunk_size=CODE_LIBRARY_CHUNK_SIZE):
+        self._file = file
+        self._chunk_size = chunk_size
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self):
+        chunk = self._file.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos :] + chunk
+        self._pos = 0
+        return True
+
+    def _peek(self):
+        while True:
+            self._pos = _WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                raise CodeLibraryError("Unexpected end of JSON document")
+
+    def _expect(self, char):
+        if self._peek() != char:
+            raise CodeLibraryError(
+                f"Expected '{char}' but found '{self._buffer[self._pos]}'"
+            )
+        self._pos += 1
+
+    def _value(self):
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError as err:
+                if not self._fill():
+                    raise CodeLibraryError(f"Invalid JSON: {err}") from err
+                continue
+            if end == len(self._buffer) and not self._eof and self._fill():
+                # A number at the end of the chunk may continue in the next one
+                continue
+            self._pos = end
+            return value
+
+    def leaves(self, path=()):
+        if self._peek() != "{":
+            yield path, self._value()
+            return
+        self._pos += 1
+        if self._peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self._value()
+            if not isinstance(key, str):
+                raise CodeLibraryError("Object keys must be strings")
+            self._expect(":")
+            yield from self.leaves(path + (key,))
+            char = self._peek()
+            self._pos += 1
+            if char == "}":
+                return
+            if char != ",":
+                raise CodeLibraryError(f"Expected ',' or '}}' but found '{char}'")
+
+
+def _iter_broadlink(file, device_name):
+    for path, value in JsonStream(file).leaves():
+        if path[:1] == ("data",) and len(path) == 3:
+            # .storage envelope
+            path = path[1:]
+        if len(path) == 2:
+            yield device_name or path[0], path[1], value, "base64"
+
+
+def _iter_smartir(file, device_name):
+    encoding = None
+    for path, value in JsonStream(file).leaves():
+        if path == ("commandsEncoding",) and isinstance(value, str):
+            encoding = value.lower()
+        elif path[:1] == ("commands",) and len(path) > 1:
+            # The encoding is usually declared before the commands; codes
+            # seen earlier are detected from their value.
+            yield device_name, "_".join(path[1:]), value, encoding
+
+
+def _iter_lines(file, device_name, encoding):
+    for line_number, line in enumerate(file, 1):
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        match = _LINE.match(line)
+        if match is None:
+            raise CodeLibraryError(f"Line {line_number} is not 'name: code'")
+        name, code = match.groups()
+        if device_name is None and "/" in name:
+            line_device, name = name.split("/", 1)
+        else:
+            line_device = device_name
+        yield line_device, name, code, encoding
+
+
+def read_code_library(path, code_format, device_name=None):
+    """Return an iterator over the normalized entries of a code library.
+
+    The arguments are checked right away; the iterator reads and parses
+    the file as it is advanced, so advance it in the executor. It yields
+    (device, command, code, error) tuples: code is normalized, or None
+    when the entry was rejected and error gives the reason. The file stays
+    open until the iterator is exhausted or closed.
+    """
+    if code_format not in FORMATS:
+        raise CodeLibraryError(f"Unknown code library format: {code_format}")
+    if code_format == FORMAT_SMARTIR and not device_name:
+        raise CodeLibraryError("A device name is needed to import a SmartIR file")
+    return _read_entries(path, code_format, device_name)
+
+
+def _read_entries(path, code_format, device_name):
+    with open(path, encoding="utf-8") as file:
+        if code_format == FORMAT_BROADLINK:
+            items = _iter_broadlink(file, device_name)
+        elif code_format == FORMAT_SMARTIR:
+            items = _iter_smartir(file, device_name)
+        else:
+            items = _iter_lines(file, device_name, code_format)
+        for item_device, command_name, code, encoding in items:
+            try:
+                if not item_device:
+                    raise CodeLibraryError("No device name given")
+                code = normalize_code(code, encoding)
+            except CodeLibraryError as err:
+                yield item_device, command_name, None, (
+                    f"{item_device}/{command_name}: {err}"
+                )
+                continue
+            yield item_device, command_name, code, None
+
+
+# Writing --------------------------------------------------------------------
+
+
+def write_code_library(path, code_format, codes):
+    """Write device -> command -> code as a library file. Blocking.
+
+    Returns (exported, skipped); toggle and RF codes have no Pronto or raw
+    representation and are skipped in those formats.
+    """
+    if code_format not in FORMATS:
+        raise CodeLibraryError(f"Unknown code library format: {code_format}")
+    exported = 0
+    skipped = 0
+    with open(path, "w", encoding="utf-8") as file:
+        if code_format in (FORMAT_BROADLINK, FORMAT_SMARTIR):
+            single = code_format == FORMAT_SMARTIR and len(codes) == 1
+            if code_format == FORMAT_SMARTIR:
+                file.write(
+                    '{"manufacturer": "Broadlink Manager", '
+                    '"supportedController": "Broadlink", '
+                    '"commandsEncoding": "Base64", "commands": '
+                )
+            file.write("{")
+            for device_index, (device_name, commands) in enumerate(codes.items()):
+                if not single:
+                    if device_index:
+                        file.write(", ")
+                    file.write(f"{json.dumps(device_name)}: {{")
+                for command_index, (command_name, code) in enumerate(commands.items()):
+                    if command_index:
+                        file.write(", ")
+                    file.write(f"{json.dumps(command_name)}: {json.dumps(code)}")
+                    exported += 1
+                if not single:
+                    file.write("}")
+            file.write("}}\n" if code_format == FORMAT_SMARTIR else "}\n")
+            return exported, skipped
+
+        for device_name, commands in codes.items():
+            for command_name, code in commands.items():
+                try:
+                    if not isinstance(code, str):
+                        raise CodeLibraryError("Toggle codes cannot be exported")
+                    pulses = packet_to_pulses(decode_code(code))
+                except (CodeLibraryError, binascii.Error, ValueError, IndexError):
+                    skipped += 1
+                    continue
+                if code_format == FORMAT_PRONTO:
+                    text = pulses_to_pronto(pulses)
+                else:
+                    text = ",".join(
+                        str(pulse if index % 2 == 0 else -pulse)
+                        for index, pulse in enumerate(pulses)
+                    )
+                file.write(f"{device_name}/{command_name}: {text}\n")
+                exported += 1
+    return exported, skipped
@@ -0,0 +1,193 @@
+import hashlib
+import json
+import sys
+
+_MISSING = object()
+
+
+def hash_commands(commands):
+    """Return the digest of one device's command -> code mapping."""
+    return hashlib.sha1(json.dumps(commands, sort_keys=True).encode("utf-8")).digest()
+
+
+def combine_hashes(device_hashes):
+    """Return the content hash of the codes from their per-device digests."""
+    content_hash = hashlib.sha1()
+    for device_name in sorted(device_hashes):
+        content_hash.update(json.dumps(device_name).encode("utf-8"))
+        content_hash.update(device_hashes[device_name])
+    return content_hash.hexdigest()
+
+
+def hash_codes(codes):
+    """Return the content hash of a device -> command -> code mapping."""
+    return combine_hashes(
+        {
+            device_name: hash_commands(commands)
+            for device_name, commands in codes.items()
+        }
+    )
+
+
+class CodesSnapshot:
+    """One immutable version of a hub's codes.
+
+    codes maps device names to command -> code dicts. Neither level is ever
+    changed once the snapshot exists, so readers can keep a snapshot across
+    awaits and it can be serialized in the executor while newer versions
+    are created. Unchanged devices are shared between versions, and so are
+    their digests, so hashing a new version only hashes the changed devices.
+    """
+
+    __slots__ = ("version", "codes", "_device_hashes", "_content_hash")
+
+    def __init__(self, version, codes, device_hashes=None):
+        self.version = version
+        self.codes = codes
+        self._device_hashes = device_hashes or {}
+        self._content_hash = None
+
+    @property
+    def content_hash(self):
+        """Hash of the codes, computed on first use."""
+        if self._content_hash is None:
+            # May run in the executor while known_hashes() reads the old
+            # mapping on the loop, so it is replaced rather than updated
+            known = self._device_hashes
+            device_hashes = {
+                device_name: known.get(device_name) or hash_commands(commands)
+                for device_name, commands in self.codes.items()
+            }
+            self._device_hashes = device_hashes
+            self._content_hash = combine_hashes(device_hashes)
+        return self._content_hash
+
+    def known_hashes(self, codes):
+        """Digests of this snapshot's devices that codes shares unchanged."""
+        return {
+            device_name: device_hash
+            for device_name, device_hash in self._device_hashes.items()
+            if codes.get(device_name) is self.codes.get(device_name)
+        }
+
+
+class CodesWriter:
+    """Copy-on-write changes on top of a CodesSnapshot.
+
+    The top-level mapping is copied once and a device's commands on its
+    first change, so the cost of a change does not depend on the size of
+    the other devices. commit() returns the result as the next version.
+    """
+
+    def __init__(self, base):
+        self.base = base
+        self.codes = dict(base.codes)
+        self._copied = set()
+
+    def commands(self, device_name):
+        """Return the device's commands for changing them."""
+        if device_name not in self._copied:
+            self.codes[device_name] = dict(self.codes.get(device_name, {}))
+            self._copied.add(device_name)
+        return self.codes[device_name]
+
+    def add_device(self, device_name):
+        if device_name not in self.codes:
+            self.codes[device_name] = {}
+            self._copied.add(device_name)
+
+    def delete_device(self, device_name):
+        del self.codes[device_name]
+        self._copied.discard(device_name)
+
+    def rename_device(self, old_name, new_name):
+        self.codes[new_name] = self.codes.pop(old_name)
+        if old_name in self._copied:
+            self._copied.discard(old_name)
+            self._copied.add(new_name)
+        else:
+            self._copied.discard(new_name)
+
+    def set(self, device_name, command_name, code):
+        self.commands(device_name)[command_name] = code
+
+    def delete(self, device_name, command_name):
+        del self.commands(device_name)[command_name]
+
+    def changed_devices(self):
+        """Return {device: commands} for the devices changed so far."""
+        return {device_name: self.codes[device_name] for device_name in self._copied}
+
+    def commit(self):
+        return CodesSnapshot(
+            self.base.version + 1, self.codes, self.base.known_hashes(self.codes)
+        )
+
+
+def compact_codes(codes):
+    """Intern names and share one string object per distinct code."""
+    texts = {}
+    return {
+        sys.intern(device_name): {
+            sys.intern(command_name): (
+                texts.setdefault(code, code) if isinstance(code, str) else code
+            )
+            for command_name, code in commands.items()
+        }
+        for device_name, commands in codes.items()
+    }
+
+
+def diff_codes(base, other):
+    """Return the changes that turn base into other.
+
+    Returns ({(device, command): code or None}, added devices, removed
+    devices), where None marks a deleted command. Devices whose commands
+    mapping is the same object in both are skipped without comparing.
+    """
+    changes = {}
+    for device_name in base.keys() | other.keys():
+        base_commands = base.get(device_name, {})
+        other_commands = other.get(device_name, {})
+        if base_commands is other_commands:
+            continue
+        for command_name in base_commands.keys() | other_commands.keys():
+            code = other_commands.get(command_name, _MISSING)
+            if base_commands.get(command_name, _MISSING) != code:
+                changes[(device_name, command_name)] = (
+                    None if code is _MISSING else code
+                )
+    return changes, other.keys() - base.keys(), base.keys() - other.keys()
+
+
+def merge_codes(base, ours, theirs):
+    """Three-way merge of external changes (theirs) into in-process ones (ours).
+
+    base is the version both sides started from. Returns (changes to apply
+    to ours, devices to add, devices to remove, rejected). An external
+    change is rejected when ours changed the same command (or, for a removed
+    device, any command of it) to something else since base.
+    """
+    our_changes, our_added, our_removed = diff_codes(base, ours)
+    their_changes, their_added, their_removed = diff_codes(base, theirs)
+    our_devices = (
+        our_added | our_removed | {device_name for device_name, _ in our_changes}
+    )
+
+    apply = {}
+    rejected = []
+    for key, code in their_changes.items():
+        our_code = our_changes.get(key, _MISSING)
+        if our_code is _MISSING and key[0] not in our_removed:
+            apply[key] = code
+        elif our_code != code:
+            rejected.append(key)
+    removed = set()
+    for device_name in their_removed:
+        if device_name in our_devices:
+            rejected.append((device_name, None))
+        else:
+            removed.add(device_name)
+    # Commands of removed devices go with the device
+    apply = {key: code for key, code in apply.items() if key[0] not in removed}
+    return apply, their_added - ours.keys(), removed & ours.keys(), rejected
@@ -1,132 +1,689 @@
+import asyncio
 import os
 import json
-from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
+import hashlib
+import heapq
+import logging
+import sys
+import time
+from contextlib import contextmanager
+from itertools import islice
+from types import MappingProxyType
+from homeassistant.const import EVENT_HOMEASSISTANT_FINAL_WRITE
+from homeassistant.core import callback
+from homeassistant.helpers.event import async_call_later
 from homeassistant.helpers.storage import Store
-from .const import DOMAIN
-from .helpers.file_watcher import FileWatcher
+from .code_cache import CodeCache, build_dedup_report, get_code_pool
+from .code_library import read_code_library, write_code_library
+from .code_store import (
+    CodesSnapshot,
+    CodesWriter,
+    combine_hashes,
+    compact_codes,
+    hash_commands,
+    merge_codes,
+)
+from .const import (
+    DOMAIN,
+    CODES_SAVE_DELAY,
+    CODE_LIBRARY_IMPORT_BATCH,
+    CODE_LIBRARY_MAX_ERRORS,
+    DEFAULT_RELOAD_DEBOUNCE,
+    METRIC_CODES_LOAD,
+    METRIC_CODES_SAVE,
+    SEARCH_LIMIT,
+)
+from .helpers.file_watcher import async_get_file_watcher
+from .helpers.metrics import Metrics
+from .helpers.utils import format_name
+from .search_index import SearchIndex
+
+_LOGGER = logging.getLogger(__name__)
+
+try:
+    import orjson
+
+    json_loads = orjson.loads
+except ImportError:  # pragma: no cover - orjson ships with Home Assistant
+    json_loads = json.loads
 
 
 class CodesManager:
-    def __init__(self, hass, mac_address):
+    """The codes of one hub, kept as immutable versioned snapshots.
+
+    Readers use the current snapshot, which never changes. Mutators work on
+    a copy-on-write CodesWriter and publish it as the next version when the
+    outermost batch ends. Loads of the codes file hold an asyncio lock and
+    are merged against the version that was last in sync with the file, so
+    in-process edits made meanwhile are kept.
+    """
+
+    # Mutators that can be replayed through apply_changes()
+    MUTATORS = (
+        "rename_device",
+        "rename_command",
+        "update_command_value",
+        "create_device",
+        "create_command",
+        "delete_device",
+        "delete_command",
+    )
+
+    def __init__(self, hass, mac_address, reload_debounce=DEFAULT_RELOAD_DEBOUNCE):
         self.hass = hass
         self.mac_address = mac_address.lower()
         self.store = Store(hass, 1, f"broadlink_remote_{self.mac_address}_codes")
         self.file_path = self.store.path
         self.file_name = os.path.basename(self.file_path)
-        self.data = None
+        self.snapshot = None  # CodesSnapshot in use
+        self.code_pool = get_code_pool(hass)
+        self.code_cache = CodeCache(self.code_pool)
+        self.search_index = SearchIndex()
+        self.metrics = Metrics()
         self.last_modified = None
+        self.reload_debounce = reload_debounce
+        self._notified_version = None
+        self._initial_load = None
+        self._cancel_pending_reload = None
+        self._cancel_pending_save = None
         self._on_change_callback = None
-        self.file_watcher = FileWatcher(self.file_path, self._on_file_change)
+        self._unsub_file_watcher = None
+        self._unsub_final_write = None
+        self._synced = None  # the CodesSnapshot the codes file holds
+        self._writer = None  # CodesWriter of the open batch
+        self._write_lock = asyncio.Lock()
+        self._batch_depth = 0
+        self._batch_dirty = False
+        self._change_flush_scheduled = False
+        self._file_signature = None
+        self._file_digest = None
+        self.load_stats = {
+            "loads": 0,
+            "skipped": 0,
+            "last_duration_ms": 0.0,
+            "last_bytes": 0,
+            "total_ms": 0.0,
+            "merged": 0,
+            "rejected": 0,
+        }
 
-    async def async_initialize(self):
-        await self._load_data()
+    async def async_initialize(self, defer_load=False):
+        """Load the codes and start watching the codes file.
+
+        With defer_load the codes are loaded in the background and readers
+        wait for them with async_wait_loaded().
+        """
+        if defer_load:
+            self._initial_load = self.hass.async_create_task(self._load_data())
+        else:
+            await self._load_data()
+        file_watcher = await async_get_file_watcher(self.hass)
+        self._unsub_file_watcher = file_watcher.register(
+            self.file_name, self._on_file_change
+        )
+        self._unsub_final_write = self.hass.bus.async_listen(
+            EVENT_HOMEASSISTANT_FINAL_WRITE, self._async_final_write
+        )
+
+    async def async_shutdown(self):
+        """Save pending changes, stop watching the file and drop any pending reload."""
+        if self._unsub_file_watcher:
+            self._unsub_file_watcher()
+            self._unsub_file_watcher = None
+        if self._unsub_final_write:
+            self._unsub_final_write()
+            self._unsub_final_write = None
+        if self._cancel_pending_save:
+            await self.save_data()
+        if self._cancel_pending_reload:
+            self._cancel_pending_reload()
+            self._cancel_pending_reload = None
+        if self._initial_load and not self._initial_load.done():
+            self._initial_load.cancel()
+        self.code_cache.detach()
 
     async def _load_data(self):
-        data = await self.store.async_load()
-        if data is None:
-            data = {
-                "version": 1,
-                "minor_version": 1,
-                "key": f"broadlink_remote_{self.mac_address}_codes",
-                "data": {},
-            }
-        elif not isinstance(data, dict) or "data" not in data:
-            data = {
-                "version": 1,
-                "minor_version": 1,
-                "key": f"broadlink_remote_{self.mac_address}_codes",
-                "data": data,
-            }
-        self.data = data
-        self.last_modified = os.path.getmtime(self.file_path)
-        if self._on_change_callback:
-            self.hass.loop.call_soon_threadsafe(
-                self.hass.async_create_task, self._on_change_callback()
+        async with self._write_lock:
+            await self._async_load_locked()
+
+    async def _async_load_locked(self):
+        base = self._synced
+        # The new codes can only replace ours as a whole if we have no
+        # unsaved edits, so only then is it worth indexing them up front
+        replace = self.snapshot is base
+
+        start = time.perf_counter()
+        result = await self.hass.async_add_executor_job(
+            self._read_codes_file, base, replace
+        )
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.metrics.record(METRIC_CODES_LOAD, elapsed_ms)
+        self.load_stats["last_duration_ms"] = round(elapsed_ms, 3)
+        if result is None:
+            self.load_stats["skipped"] += 1
+            _LOGGER.debug("Codes in %s are unchanged, skipping reload", self.file_name)
+            return
+
+        if self._synced is not base:
+            # Our codes were written while the file was read; the event
+            # from that write brings us back here.
+            _LOGGER.debug("Codes saved while reading %s, rereading", self.file_name)
+            return
+
+        signature, file_digest, device_hashes, codes, code_cache, search_index = result
+        self._file_signature = signature
+        self._file_digest = file_digest
+        self.last_modified = signature[0] if signature else None
+        self.load_stats["loads"] += 1
+        self.load_stats["last_bytes"] = signature[1] if signature else 0
+        self.load_stats["total_ms"] += elapsed_ms
+        _LOGGER.debug(
+            "Loaded %s (%d bytes) in %.1f ms",
+            self.file_name,
+            self.load_stats["last_bytes"],
+            elapsed_ms,
+        )
+        if codes is None:
+            # The file holds the codes we last loaded or saved
+            return
+
+        if self.snapshot is base and code_cache is not None:
+            self._replace_codes(codes, device_hashes, code_cache, search_index)
+        else:
+            self._merge_codes(base, CodesSnapshot(0, codes, device_hashes))
+
+    def _replace_codes(self, codes, device_hashes, code_cache, search_index):
+        version = self.snapshot.version + 1 if self.snapshot else 1
+        self.snapshot = self._synced = CodesSnapshot(version, codes, device_hashes)
+        # Reference the new codes in the shared pool before releasing the old
+        # ones, so payloads used by both stay in place
+        code_cache.attach(self.code_pool)
+        self.code_cache, old_code_cache = code_cache, self.code_cache
+        old_code_cache.detach()
+        self.search_index = search_index
+        self._notified_version = version
+        self._notify_change()
+
+    def _merge_codes(self, base, theirs):
+        """Apply file changes that do not conflict with our unsaved edits.
+
+        A conflicting change is rejected: our edit was made after the version
+        both sides started from and is written back by the pending save.
+        """
+        changes, added, removed, rejected = merge_codes(
+            base.codes, self.snapshot.codes, theirs.codes
+        )
+        self._synced = theirs
+        with self.batch():
+            for device_name in added:
+                self._add_device(device_name)
+            for (device_name, command_name), code in changes.items():
+                if code is None:
+                    self._delete_command(device_name, command_name)
+                else:
+                    self._add_device(device_name)
+                    self._set_command(device_name, command_name, code)
+            for device_name in removed:
+                self._delete_device(device_name)
+        self.load_stats["merged"] += len(changes) + len(added) + len(removed)
+        self.load_stats["rejected"] += len(rejected)
+        if rejected:
+            _LOGGER.warning(
+                "Kept in-process edits of %s over %d conflicting changes in the file: %s",
+                self.file_name,
+                len(rejected),
+                rejected[:10],
             )
 
+    def _read_codes_file(self, base, build):
+        """Read, parse and index the codes file. Runs in the executor.
+
+        Returns None when the file's mtime and size match the last load or
+        save. Otherwise returns (signature, file_digest, device_hashes, codes,
+        code_cache, search_index). device_hashes maps devices to the digests
+        of their commands. codes and the rest are None if the file holds the
+        same codes as base, and only the first four are set unless build.
+        base is immutable, so it is safe to read here.
+        """
+        signature = self._stat_signature()
+        if signature is not None and signature == self._file_signature:
+            return None
+
+        codes = {}
+        file_digest = None
+        if signature is not None:
+            with open(self.file_path, "rb") as codes_file:
+                raw = codes_file.read()
+            file_digest = hashlib.sha1(raw).hexdigest()
+            if file_digest == self._file_digest:
+                return signature, file_digest, None, None, None, None
+            parsed = json_loads(raw) if raw.strip() else None
+            if isinstance(parsed, dict) and "key" in parsed and "data" in parsed:
+                # Store envelope: {"version", "minor_version", "key", "data"}
+                parsed = parsed["data"]
+            if isinstance(parsed, dict) and "key" in parsed and "data" in parsed:
+                # Files written with a doubly wrapped envelope
+                parsed = parsed["data"]
+            codes = parsed or {}
+
+        device_hashes = {
+            device_name: hash_commands(commands)
+            for device_name, commands in codes.items()
+        }
+        if base is not None and combine_hashes(device_hashes) == base.content_hash:
+            return signature, file_digest, None, None, None, None
+
+        codes = compact_codes(codes)
+        if not build:
+            return signature, file_digest, device_hashes, codes, None, None
+        code_cache = CodeCache()
+        code_cache.build(codes)
+        search_index = SearchIndex()
+        search_index.build(codes)
+        return signature, file_digest, device_hashes, codes, code_cache, search_index
+
+    @property
+    def loaded(self):
+        return self.snapshot is not None
+
+    @property
+    def version(self):
+        """Version of the codes in use, or None before they are loaded."""
+        return self.snapshot.version if self.snapshot else None
+
+    @property
+    def content_hash(self):
+        """Hash of the codes in use, or None before they are loaded.
+
+        Only the devices changed since the last hashed version are hashed.
+        """
+        return self.snapshot.content_hash if self.snapshot else None
+
+    async def async_wait_loaded(self):
+        """Wait for codes that are still being loaded in the background."""
+        if self._initial_load is not None and not self.loaded:
+            await asyncio.shield(self._initial_load)
+
+    def get_code(self, device_name, command_name):
+        """Return the decoded code (bytes, or a tuple for toggles), or None."""
+        return self.code_cache.get(device_name, command_name)
+
+    def memory_usage(self):
+        """Approximate memory used by this hub's decoded codes."""
+        return self.code_cache.memory_usage()
+
     def set_on_change_callback(self, callback):
         self._on_change_callback = callback
 
     async def save_data(self):
-        await self.store.async_save(self.data)
-        self.last_modified = os.path.getmtime(self.file_path)
+        """Write the codes now, replacing any pending delayed save.
+
+        If the file was changed by someone else since we last loaded or
+        saved it, those changes are merged in first so the write keeps them.
+        """
+        async with self._write_lock:
+            signature = await self.hass.async_add_executor_job(self._stat_signature)
+            if signature != self._file_signature:
+                await self._async_load_locked()
+            # The merge may have scheduled a save of its own; this one covers it
+            if self._cancel_pending_save:
+                self._cancel_pending_save()
+                self._cancel_pending_save = None
+            with self.metrics.timer(METRIC_CODES_SAVE):
+                await self.store.async_save(self._data_to_save())
+            # Remember what we wrote so the file event it triggers is ignored
+            self._file_signature = await self.hass.async_add_executor_job(
+                self._stat_signature
+            )
+        self.last_modified = self._file_signature and self._file_signature[0]
+        self._flush_changes()
+
+    def _data_to_save(self):
+        # The snapshot never changes, so Store may serialize it after newer
+        # edits were made.
+        self._synced = self.snapshot
+        self._file_digest = None
+        # Store adds the version/key envelope itself; the core Broadlink
+        # integration expects the plain device -> commands mapping inside it.
+        return self.snapshot.codes
+
+    @contextmanager
+    def batch(self):
+        """Group mutations into one new version, one save and one reload.
+
+        Usage::
+
+            with codes_manager.batch():
+                codes_manager.rename_command("tv", "pwr", "power")
+                codes_manager.delete_command("tv", "old")
+        """
+        if self.snapshot is None:
+            raise ValueError("Data not loaded. Ensure _load_data is called first.")
+        if self._batch_depth == 0:
+            self._writer = CodesWriter(self.snapshot)
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                writer, self._writer = self._writer, None
+                if self._batch_dirty:
+                    self._batch_dirty = False
+                    self.snapshot = writer.commit()
+                    self._mark_changed()
+
+    def apply_changes(self, changes):
+        """Apply (mutator_name, *args) tuples as one batch."""
+        with self.batch():
+            for mutator_name, *args in changes:
+                if mutator_name not in self.MUTATORS:
+                    raise ValueError(f"Unknown change: {mutator_name}")
+                getattr(self, mutator_name)(*args)
+
+    @callback
+    def _mark_changed(self):
+        """Schedule a delayed save and one change notification for a burst."""
+        if self._cancel_pending_save:
+            self._cancel_pending_save()
+        # Not Store.async_delay_save: save_data() records the signature of
+        # the file it wrote, so the file event of our own write is ignored
+        self._cancel_pending_save = async_call_later(
+            self.hass, CODES_SAVE_DELAY, self._async_delayed_save
+        )
+        if not self._change_flush_scheduled:
+            self._change_flush_scheduled = True
+            self.hass.loop.call_soon(self._flush_changes)
+
+    @callback
+    def _flush_changes(self):
+        self._change_flush_scheduled = False
+        # Comparing versions keeps hashing off the loop; listeners compare
+        # content hashes themselves if they need to
+        if self.snapshot.version != self._notified_version:
+            self._notified_version = self.snapshot.version
+            self._notify_change()
+
+    async def _async_delayed_save(self, _now):
+        self._cancel_pending_save = None
+        await self.save_data()
+
+    async def _async_final_write(self, _event):
+        # Home Assistant is stopping; write changes still waiting for the delay
+        if self._cancel_pending_save:
+            await self.save_data()
+
+    def _notify_change(self):
+        if self._on_change_callback:
+            self.hass.async_create_task(self._on_change_callback())
+
+    def _stat_signature(self):
+        """Return (mtime, size) of the codes file, or None if it is missing."""
+        try:
+            stat = os.stat(self.file_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime, stat.st_size
 
     def _on_file_change(self):
-        self.hass.loop.call_soon_threadsafe(
-            self.hass.async_create_task, self._load_data()
+        # Called from the watchdog thread for every write event
+        self.hass.loop.call_soon_threadsafe(self._schedule_reload)
+
+    @callback
+    def _schedule_reload(self):
+        """Restart the quiet window so a burst of writes triggers one reload."""
+        if self._cancel_pending_reload:
+            self._cancel_pending_reload()
+        self._cancel_pending_reload = async_call_later(
+            self.hass, self.reload_debounce, self._async_debounced_reload
         )
 
+    async def _async_debounced_reload(self, _now):
+        self._cancel_pending_reload = None
+        # _load_data skips files whose mtime and size match our last
+        # load or save_data() write, and codes equal to those in memory
+        await self._load_data()
+
+    def _codes(self):
+        """The codes of the open batch, else those of the current snapshot."""
+        if self._writer is not None:
+            return self._writer.codes
+        if self.snapshot is None:
+            raise ValueError("Data not loaded. Ensure _load_data is called first.")
+        return self.snapshot.codes
+
     def get_all_devices(self):
-        if self.data is None:
-            raise ValueError(
-                "Data not loaded. Ensure async_initialize is called first."
-            )
-        return list(self.data["data"].keys())
+        return list(self._codes())
 
     def get_device_codes(self, device_name):
-        if self.data is None:
-            raise ValueError(
-                "Data not loaded. Ensure async_initialize is called first."
-            )
-        return self.data["data"].get(device_name, {})
+        """Return a read-only view of the device's command -> code mapping."""
+        return MappingProxyType(self._codes().get(device_name, {}))
 
     def device_exists(self, device_name):
-        if self.data is None:
-            raise ValueError("Data not loaded. Ensure _load_data is called first.")
-        return device_name in self.data["data"]
+        return device_name in self._codes()
 
     def command_exists(self, device_name, command_name):
-        if self.data is None:
-            raise ValueError("Data not loaded. Ensure _load_data is called first.")
-        return command_name in self.data["data"].get(device_name, {})
+        return command_name in self._codes().get(device_name, {})
 
     def rename_device(self, old_name, new_name):
-        if self.device_exists(old_name):
-            self.data["data"][new_name] = self.data["data"].pop(old_name)
-            self.hass.async_create_task(self.save_data())
+        if self.device_exists(old_name) and new_name != old_name:
+            new_name = sys.intern(new_name)
+            with self.batch():
+                if self.device_exists(new_name):
+                    self._delete_device(new_name)
+                self._writer.rename_device(old_name, new_name)
+                self.code_cache.rename_device(old_name, new_name)
+                self.search_index.rename_device(old_name, new_name)
+                self._batch_dirty = True
 
     def rename_command(self, device_name, old_command, new_command):
-        if self.command_exists(device_name, old_command):
-            self.data["data"][device_name][new_command] = self.data["data"][
-                device_name
-            ].pop(old_command)
-            self.hass.async_create_task(self.save_data())
+        if self.command_exists(device_name, old_command) and new_command != old_command:
+            new_command = sys.intern(new_command)
+            with self.batch():
+                commands = self._writer.commands(device_name)
+                commands[new_command] = commands.pop(old_command)
+                self.code_cache.rename_command(device_name, old_command, new_command)
+                self.search_index.remove(device_name, old_command)
+                self.search_index.add(device_name, new_command)
+                self._batch_dirty = True
 
     def update_command_value(self, device_name, command_name, command_value):
         if self.device_exists(device_name):
-            self.data["data"][device_name][command_name] = command_value
-            self.hass.async_create_task(self.save_data())
+            with self.batch():
+                self._set_command(device_name, command_name, command_value)
 
     def create_device(self, device_name):
         if not self.device_exists(device_name):
-            self.data["data"][device_name] = {}
-            self.hass.async_create_task(self.save_data())
+            with self.batch():
+                self._add_device(device_name)
 
     def create_command(self, device_name, command_name, command_value):
         if self.device_exists(device_name):
-            self.data["data"][device_name][command_name] = command_value
-            self.hass.async_create_task(self.save_data())
+            with self.batch():
+                self._set_command(device_name, command_name, command_value)
 
     def delete_device(self, device_name):
         if self.device_exists(device_name):
-            del self.data["data"][device_name]
-            self.hass.async_create_task(self.save_data())
+            with self.batch():
+                self._delete_device(device_name)
 
     def delete_command(self, device_name, command_name):
         if self.command_exists(device_name, command_name):
-            del self.data["data"][device_name][command_name]
-            self.hass.async_create_task(self.save_data())
+            with self.batch():
+                self._delete_command(device_name, command_name)
+
+    # The helpers below change the open batch's writer, the code cache and
+    # the search index together
+
+    def _add_device(self, device_name):
+        if device_name not in self._writer.codes:
+            device_name = sys.intern(device_name)
+            self._writer.add_device(device_name)
+            self.code_cache.add_device(device_name)
+            self.search_index.add_device(device_name)
+            self._batch_dirty = True
+
+    def _set_command(self, device_name, command_name, code):
+        command_name = sys.intern(command_name)
+        self._writer.set(device_name, command_name, code)
+        self.code_cache.set(device_name, command_name, code)
+        self.search_index.add(device_name, command_name)
+        self._batch_dirty = True
+
+    def _delete_device(self, device_name):
+        self._writer.delete_device(device_name)
+        self.code_cache.remove_device(device_name)
+        self.search_index.remove_device(device_name)
+        self._batch_dirty = True
+
+    def _delete_command(self, device_name, command_name):
+        if command_name in self._writer.codes.get(device_name, {}):
+            self._writer.delete(device_name, command_name)
+            self.code_cache.remove(device_name, command_name)
+            self.search_index.remove(device_name, command_name)
+            self._batch_dirty = True
+
+    def search(self, query, limit=SEARCH_LIMIT, device_name=None):
+        """Find devices and commands by name words or word prefixes."""
+        return [result for _, result in self.search_ranked(query, limit, device_name)]
+
+    def search_ranked(self, query, limit=SEARCH_LIMIT, device_name=None):
+        """Like search(), but return (rank, result) pairs for merging hubs."""
+        return [
+            (
+                rank,
+                {
+                    "mac_address": self.mac_address,
+                    "device": found_device,
+                    "command": command_name,
+                    "device_name": format_name(found_device),
+                    "command_name": command_name and format_name(command_name),
+                },
+            )
+            for rank, (found_device, command_name) in self.search_index.search_ranked(
+                query, limit, device_name
+            )
+        ]
+
+    async def async_import_codes(
+        self, path, code_format, device_name=None, overwrite=False
+    ):
+        """Import a code library file in one batch.
+
+        The file is parsed and the codes normalized in the executor, a few
+        entries at a time, and staged on a CodesWriter of their own, so the
+        entries are never collected in a list. The staged codes are then
+        committed as one batch, which means one save and one entity update;
+        nothing changes if the file turns out to be malformed. Existing
+        commands are kept unless overwrite is set.
+        """
+        await self.async_wait_loaded()
+        result = {"imported": 0, "updated": 0, "skipped": 0, "rejected": 0}
+        errors = []
+        async with self._write_lock:
+            staged = CodesWriter(self.snapshot)
+            entries = read_code_library(path, code_format, device_name)
+            try:
+                while True:
+                    chunk = await self.hass.async_add_executor_job(
+                        list, islice(entries, CODE_LIBRARY_IMPORT_BATCH)
+                    )
+                    if not chunk:
+                        break
+                    for entry_device, command_name, code, error in chunk:
+                        if error is not None:
+                            result["rejected"] += 1
+                            if len(errors) < CODE_LIBRARY_MAX_ERRORS:
+                                errors.append(error)
+                            continue
+                        if command_name in staged.codes.get(entry_device, ()):
+                            if not overwrite:
+                                result["skipped"] += 1
+                                continue
+                            result["updated"] += 1
+                        else:
+                            result["imported"] += 1
+                        staged.set(entry_device, command_name, code)
+            finally:
+                await self.hass.async_add_executor_job(entries.close)
+
+            # Apply the staged devices on top of the current codes, which
+            # may have been edited in-process meanwhile
+            with self.batch():
+                for entry_device, commands in staged.changed_devices().items():
+                    current = self._codes().get(entry_device)
+                    if current is None:
+                        self._add_device(entry_device)
+                        current = {}
+                    for command_name, code in commands.items():
+                        if current.get(command_name) != code:
+                            self._set_command(entry_device, command_name, code)
+        _LOGGER.info("Imported %s into %s: %s", path, self.file_name, result)
+        result["errors"] = errors
+        return result
+
+    async def async_export_codes(self, path, code_format, devices=None):
+        """Write the codes of the given devices (default all) to a library file."""
+        await self.async_wait_loaded()
+        # A snapshot does not change, so it can be written out in the executor
+        snapshot_codes = self.snapshot.codes
+        codes = {
+            device_name: snapshot_codes[device_name]
+            for device_name in (devices or snapshot_codes)
+            if device_name in snapshot_codes
+        }
+        exported, skipped = await self.hass.async_add_executor_job(
+            write_code_library, path, code_format, codes
+        )
+        return {"exported": exported, "skipped": skipped}
 
     @staticmethod
-    async def get_or_create(hass, mac_address):
+    async def get_or_create(hass, mac_address, defer_load=False):
         mac_address = mac_address.lower()
         if DOMAIN not in hass.data:
             hass.data[DOMAIN] = {}
         if mac_address not in hass.data[DOMAIN]:
             codes_manager = CodesManager(hass, mac_address)
-            await codes_manager.async_initialize()
+            await codes_manager.async_initialize(defer_load)
             hass.data[DOMAIN][mac_address] = codes_manager
         else:
             codes_manager = hass.data[DOMAIN][mac_address]
         return codes_manager
+
+
+async def async_build_code_report(hass):
+    """Report duplicate and near-duplicate codes across all hubs."""
+    pool = get_code_pool(hass)
+    locations = [
+        (
+            record.digest,
+            codes_manager.mac_address,
+            record.device_name,
+            record.command_name,
+        )
+        for codes_manager in hass.data.get(DOMAIN, {}).values()
+        if isinstance(codes_manager, CodesManager)
+        for record in codes_manager.code_cache.records()
+    ]
+    payloads = {digest: pool.get(digest) for digest, *_ in locations if digest}
+    return await hass.async_add_executor_job(build_dedup_report, payloads, locations)
+
+
+@callback
+async def async_search_codes(hass, query, mac_address=None, limit=SEARCH_LIMIT):
+    """Search the codes of one hub, or of every hub.
+
+    Codes still loading in the background are waited for. Each hub returns
+    its best limit results with their ranks, which are merged so the
+    results are ranked across hubs.
+    """
+    ranked = []
+    for codes_manager in list(hass.data.get(DOMAIN, {}).values()):
+        if isinstance(codes_manager, CodesManager) and (
+            mac_address is None or codes_manager.mac_address == mac_address
+        ):
+            await codes_manager.async_wait_loaded()
+            ranked.extend(codes_manager.search_ranked(query, limit))
+    return [
+        result for _, result in heapq.nsmallest(limit, ranked, key=lambda item: item[0])
+    ]
@@ -1,100 +1,60 @@
 import logging
 from homeassistant.components.button import ButtonEntity
-from homeassistant.helpers import device_registry as dr, entity_registry as er
+from .const import METRIC_PRESS
+from .helpers.utils import format_name
 
 _LOGGER = logging.getLogger(__name__)
 
 
 class CommandButton(ButtonEntity):
-    """Representation of a Broadlink command as a button."""
+    """Representation of a Broadlink command as a button.
+
+    Naming and device_info come from the ControlledDeviceMetadata shared by
+    all buttons of the same device, so a button only holds its command.
+    """
 
     def __init__(
-        self,
-        mac_address,
-        device_name,
-        command_name,
-        formatted_device_name,
-        formatted_command_name,
-        command_data,
-        unique_id,
-        config_entry,
+        self, metadata, command_name, unique_id, device_manager, formatted_name=None
     ):
-        self._mac_address = mac_address
-        self._device_name = device_name  # Original device name
+        self._metadata = metadata
         self._command_name = command_name  # Original command name
-        self._formatted_device_name = formatted_device_name
-        self._formatted_command_name = formatted_command_name
-        self._command_data = command_data
-        self._attr_name = f"{formatted_device_name} {formatted_command_name} Button"
-        self._attr_unique_id = unique_id
-        self._attr_device_info = {
-            "identifiers": {
-                (dr.CONNECTION_NETWORK_MAC, f"{mac_address}_{device_name}")
-            },
-            "name": formatted_device_name,
-            "manufacturer": "Broadlink",
-            "model": "Controlled Device",
-            "sw_version": "1.0",
-            "via_device": (dr.CONNECTION_NETWORK_MAC, mac_address),
-        }
-        self._config_entry = config_entry
-
-    async def async_press(self):
-        """Handle the button press asynchronously."""
-        _LOGGER.debug(
-            f"Sending command '{self._command_name}' for device '{self._device_name}' via hub '{self._mac_address}'"
+        self._device_manager = device_manager
+        self._attr_name = (
+            f"{metadata.formatted_name} "
+            f"{formatted_name or format_name(command_name)} Button"
         )
+        self._attr_unique_id = unique_id
 
-        # Normalize MAC address for consistent lookup
-        normalized_mac = self._normalize_mac(self._mac_address)
-
-        # Retrieve the device from the device registry
-        device_registry = dr.async_get(self.hass)
-        device = None
-
-        # Look up the device using the normalized MAC address
-        for device_entry in device_registry.devices.values():
-            for identifier in device_entry.identifiers:
-                test_value = self._normalize_mac(identifier[1])
-                if "broadlink" in identifier[0] and test_value == normalized_mac:
-                    device = device_entry
-                    break
-
-        if not device:
-            _LOGGER.error(
-                f"No device found in the registry for MAC address: {self._mac_address}"
-            )
-            return
+    @property
+    def device_name(self):
+        """The original device name."""
+        return self._metadata.device_name
 
-        # Find the associated remote entity for this device
-        entity_registry = er.async_get(self.hass)
-        remote_entity_id = None
+    @property
+    def command_name(self):
+        """The original command name."""
+        return self._command_name
 
-        for entity_entry in entity_registry.entities.values():
-            if entity_entry.device_id == device.id and entity_entry.domain == "remote":
-                remote_entity_id = entity_entry.entity_id
-                break
+    @property
+    def device_info(self):
+        return self._metadata.device_info
 
-        if not remote_entity_id:
-            _LOGGER.error(f"Could not find remote entity for device: {device.name}")
-            return
+    @property
+    def available(self):
+        """Buttons follow the online state of their hub."""
+        return self._device_manager.hub_available
 
-        # Build the service data using original device and command names
-        service_data = {
-            "entity_id": remote_entity_id,
-            "device": self._device_name,
-            "command": self._command_name,
-        }
+    async def async_added_to_hass(self):
+        """Record the entity ID so cleanup can find this button directly."""
+        self._device_manager.ownership.add_entity(self.unique_id, self.entity_id)
 
-        # Call the remote.send_command service
-        await self.hass.services.async_call(
-            domain="remote",
-            service="send_command",
-            service_data=service_data,
-            blocking=True,
+    async def async_press(self):
+        """Handle the button press asynchronously."""
+        _LOGGER.debug(
+            f"Sending command '{self._command_name}' for device '{self._metadata.device_name}' via hub '{self._metadata.mac_address}'"
         )
 
-    @staticmethod
-    def _normalize_mac(mac: str) -> str:
-        """Normalize a MAC address by removing colons and converting to uppercase."""
-        return mac.replace(":", "").upper()
+        with self._device_manager.metrics.timer(METRIC_PRESS):
+            await self._device_manager.async_send_command(
+                self._metadata.device_name, self._command_name
+            )
@@ -1,10 +1,18 @@
 import logging
 from homeassistant import config_entries
 from homeassistant.core import callback
+import homeassistant.helpers.config_validation as cv
 import voluptuous as vol
-from .const import DOMAIN
+from .const import (
+    DOMAIN,
+    CONF_DIRECT_SEND,
+    CONF_EXPOSED_COMMANDS,
+    CONF_EXPOSED_DEVICES,
+    CONF_RELOAD_DEBOUNCE,
+    DEFAULT_RELOAD_DEBOUNCE,
+)
 from .codes_manager import CodesManager
-from .broadlink_hub import BroadlinkHub
+from .broadlink_hub import async_get_hub_registry
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -15,33 +23,39 @@ class BroadlinkManagerConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
     VERSION = 1
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry):
+        return BroadlinkManagerOptionsFlowHandler(config_entry)
+
     async def async_step_user(self, user_input=None):
         """Handle the initial step where the user selects a Broadlink device."""
         errors = {}
 
-        # Find registered Broadlink devices using BroadlinkHub
-        devices = BroadlinkHub.find_registered_devices(self.hass)
+        # Broadlink hubs registered by the core integration
+        hubs = async_get_hub_registry(self.hass).hubs()
 
-        if not devices:
+        if not hubs:
             return self.async_abort(reason="no_broadlink_devices_found")
 
-        devices_dict = {device["name"]: device for device in devices}
+        devices_dict = {hub.name: hub for hub in hubs}
 
         if user_input is not None:
-            selected_device = devices_dict[user_input["device_name"]]
+            selected_hub = devices_dict[user_input["device_name"]]
 
             # Initialize the CodesManager if it doesn't exist
-            mac_address = selected_device["mac_address"]
-            codes_manager = await CodesManager.get_or_create(self.hass, mac_address)
+            codes_manager = await CodesManager.get_or_create(
+                self.hass, selected_hub.mac_address
+            )
 
             _LOGGER.debug(f"Loaded codes for device: {codes_manager.get_all_devices()}")
 
             # Store the selected device's information and create an entry
             return self.async_create_entry(
-                title=selected_device["name"],
+                title=selected_hub.name,
                 data={
-                    "device_name": selected_device["name"],
-                    "mac_address": selected_device["mac_address"],
+                    "device_name": selected_hub.name,
+                    "mac_address": selected_hub.mac_address,
                 },
             )
 
@@ -63,15 +77,81 @@ class BroadlinkManagerOptionsFlowHandler(config_entries.OptionsFlow):
 
     def __init__(self, config_entry):
         self.config_entry = config_entry
+        self._options = {}
+
+    def _codes_manager(self):
+        """Return the entry's codes manager, or None if the entry is not loaded."""
+        device_manager = self.hass.data.get(DOMAIN, {}).get(self.config_entry.entry_id)
+        return device_manager.codes_manager if device_manager else None
 
     async def async_step_init(self, user_input=None):
+        """Pick the devices exposed as buttons and the general settings."""
         if user_input is not None:
-            return self.async_create_entry(title="", data=user_input)
-
+            self._options.update(user_input)
+            return await self.async_step_commands()
+
+        codes_manager = self._codes_manager()
+        if codes_manager is None:
+            return self.async_abort(reason="not_loaded")
+        options = self.config_entry.options
+        await codes_manager.async_wait_loaded()
+        devices = codes_manager.get_all_devices()
         options_schema = vol.Schema(
             {
-                vol.Optional("rename_device", default=""): str,
+                vol.Optional(
+                    CONF_EXPOSED_DEVICES,
+                    default=[
+                        device
+                        for device in options.get(CONF_EXPOSED_DEVICES, [])
+                        if device in devices
+                    ],
+                ): cv.multi_select({device: device for device in devices}),
+                vol.Optional(
+                    CONF_RELOAD_DEBOUNCE,
+                    default=options.get(CONF_RELOAD_DEBOUNCE, DEFAULT_RELOAD_DEBOUNCE),
+                ): vol.All(vol.Coerce(float), vol.Range(min=0)),
+                vol.Optional(
+                    CONF_DIRECT_SEND, default=options.get(CONF_DIRECT_SEND, False)
+                ): bool,
             }
         )
 
         return self.async_show_form(step_id="init", data_schema=options_schema)
+
+    async def async_step_commands(self, user_input=None):
+        """Pick single commands of the devices that are not fully exposed."""
+        if user_input is not None:
+            self._options.update(user_input)
+            return self.async_create_entry(title="", data=self._options)
+
+        codes_manager = self._codes_manager()
+        if codes_manager is None:
+            return self.async_abort(reason="not_loaded")
+        exposed_devices = set(self._options.get(CONF_EXPOSED_DEVICES, []))
+        commands = [
+            f"{device}/{command}"
+            for device in codes_manager.get_all_devices()
+            if device not in exposed_devices
+            for command in codes_manager.get_device_codes(device)
+        ]
+        if not commands:
+            # Every device is fully exposed, or there are no commands
+            self._options[CONF_EXPOSED_COMMANDS] = []
+            return self.async_create_entry(title="", data=self._options)
+
+        options_schema = vol.Schema(
+            {
+                vol.Optional(
+                    CONF_EXPOSED_COMMANDS,
+                    default=[
+                        command
+                        for command in self.config_entry.options.get(
+                            CONF_EXPOSED_COMMANDS, []
+                        )
+                        if command in commands
+                    ],
+                ): cv.multi_select({command: command for command in commands}),
+            }
+        )
+
+        return self.async_show_form(step_id="commands", data_schema=options_schema)
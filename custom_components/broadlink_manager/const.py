@@ -1 +1,109 @@
 DOMAIN = "broadlink_manager"
+BROADLINK_DOMAIN = "broadlink"
+
+DATA_FILE_WATCHER = f"{DOMAIN}_file_watcher"
+DATA_DISCOVERY_CACHE = f"{DOMAIN}_discovery_cache"
+DATA_CONNECTION_POOL = f"{DOMAIN}_connection_pool"
+DATA_HUB_REGISTRY = f"{DOMAIN}_hub_registry"
+DATA_CODE_POOL = f"{DOMAIN}_code_pool"
+DATA_WEBSOCKET = f"{DOMAIN}_websocket"
+DATA_HUB_HEALTH = f"{DOMAIN}_hub_health"
+
+CONF_RELOAD_DEBOUNCE = "reload_debounce"
+CONF_DIRECT_SEND = "direct_send"
+CONF_EXPOSED_DEVICES = "exposed_devices"
+CONF_EXPOSED_COMMANDS = "exposed_commands"  # "device/command" keys
+
+# Quiet window (seconds) a codes file must stay unchanged before it is reloaded
+DEFAULT_RELOAD_DEBOUNCE = 1.0
+
+# Delay (seconds) used to coalesce codes file writes after a mutation
+CODES_SAVE_DELAY = 1
+
+# Delay (seconds) used to coalesce writes of the owned devices/entities index
+OWNERSHIP_SAVE_DELAY = 10
+
+# Startup snapshot of the buttons built from a codes file; bump the format
+# whenever the stored fields or their meaning change
+SNAPSHOT_FORMAT = 1
+SNAPSHOT_SAVE_DELAY = 10
+
+# Network discovery
+DISCOVERY_TIMEOUT = 5
+DISCOVERY_BROADCAST_ADDRESS = "255.255.255.255"
+DISCOVERY_CACHE_TTL = 60
+
+# Direct-to-hub sending
+DIRECT_SEND_BACKOFF_MIN = 1
+DIRECT_SEND_BACKOFF_MAX = 60
+
+# Hub health: background probes, adaptive send timeouts and circuit breaker
+HUB_PROBE_INTERVAL = 30
+HUB_PROBE_INTERVAL_DOWN = 10
+# Retry interval while the hub's address is unknown and it cannot be probed
+HUB_PROBE_INTERVAL_UNKNOWN = 120
+HUB_PROBE_TIMEOUT = 2
+HUB_FAILURE_THRESHOLD = 3
+HUB_BREAKER_COOLDOWN = 30
+# A send may take HUB_TIMEOUT_FACTOR times the hub's p95 send latency
+HUB_TIMEOUT_FACTOR = 4
+HUB_TIMEOUT_MIN = 2
+
+# Send queue and macros
+SEND_QUEUE_MAXSIZE = 32
+DEFAULT_MACRO_DELAY = 0.4
+
+SERVICE_SEND_MACRO = "send_macro"
+SERVICE_SEND_COMMAND = "send_command"
+SERVICE_SEND_TO_HUBS = "send_to_hubs"
+SERVICE_CODE_REPORT = "code_report"
+SERVICE_SEARCH_CODES = "search_codes"
+ATTR_MAC_ADDRESS = "mac_address"
+ATTR_DEVICE = "device"
+ATTR_COMMAND = "command"
+ATTR_COMMANDS = "commands"
+ATTR_DELAY_SECS = "delay_secs"
+ATTR_NUM_REPEATS = "num_repeats"
+ATTR_MAC_ADDRESSES = "mac_addresses"
+ATTR_TIMEOUT = "timeout"
+ATTR_QUERY = "query"
+ATTR_LIMIT = "limit"
+
+# Seconds each hub gets to send a fanned-out command
+DEFAULT_HUB_TIMEOUT = 10
+
+# Code library import/export
+CODE_LIBRARY_CHUNK_SIZE = 64 * 1024
+# Entries parsed per executor job while importing
+CODE_LIBRARY_IMPORT_BATCH = 1000
+CODE_LIBRARY_MAX_ERRORS = 20
+
+SERVICE_IMPORT_CODES = "import_codes"
+SERVICE_EXPORT_CODES = "export_codes"
+ATTR_FILE_PATH = "file_path"
+ATTR_FORMAT = "format"
+ATTR_DEVICES = "devices"
+ATTR_OVERWRITE = "overwrite"
+
+# Results returned by a code search unless a limit is given
+SEARCH_LIMIT = 25
+SEARCH_LIMIT_MAX = 500
+
+# Groups listed per section of the duplicate code report
+DEDUP_REPORT_LIMIT = 50
+
+# Buttons are added in batches of this size, yielding to the loop in between
+ENTITY_BATCH_SIZE = 100
+
+# Timing metrics, in milliseconds over the last METRICS_WINDOW samples
+METRICS_WINDOW = 200
+METRIC_PRESS = "press"
+METRIC_HUB_SEND = "hub_send"
+METRIC_HUB_PROBE = "hub_probe"
+METRIC_QUEUE_WAIT = "queue_wait"
+METRIC_REMOTE_LOOKUP = "remote_lookup"
+METRIC_SEND_DIRECT = "send_direct"
+METRIC_SEND_SERVICE = "send_service"
+METRIC_RELOAD = "reload"
+METRIC_CODES_LOAD = "codes_load"
+METRIC_CODES_SAVE = "codes_save"
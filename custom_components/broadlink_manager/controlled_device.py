@@ -1,31 +1,68 @@
 import logging
+from types import MappingProxyType
 from homeassistant.helpers import device_registry as dr
+from .helpers.utils import format_name
 
 _LOGGER = logging.getLogger(__name__)
 
 
+class ControlledDeviceMetadata:
+    """Immutable naming and device_info shared by all buttons of one device."""
+
+    __slots__ = ("mac_address", "device_name", "formatted_name", "device_info")
+
+    def __init__(self, mac_address, device_name, formatted_name=None):
+        formatted_name = formatted_name or format_name(device_name)
+        object.__setattr__(self, "mac_address", mac_address)
+        object.__setattr__(self, "device_name", device_name)
+        object.__setattr__(self, "formatted_name", formatted_name)
+        object.__setattr__(
+            self,
+            "device_info",
+            MappingProxyType(
+                {
+                    "identifiers": {
+                        (dr.CONNECTION_NETWORK_MAC, f"{mac_address}_{device_name}")
+                    },
+                    "name": formatted_name,
+                    "manufacturer": "Broadlink",
+                    "model": "Controlled Device",
+                    "sw_version": "1.0",
+                    "via_device": (dr.CONNECTION_NETWORK_MAC, mac_address),
+                }
+            ),
+        )
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+
 class ControlledDevice:
     def __init__(self, hass, mac_address, device_name):
         self.hass = hass
         self.mac_address = mac_address
         self.device_name = device_name
 
-    async def register(self, config_entry):
-        device_registry = dr.async_get(self.hass)
-        unique_id = f"{self.mac_address}_{self.device_name}"
-        device_registry.async_get_or_create(
-            config_entry_id=config_entry.entry_id,
-            identifiers={(dr.CONNECTION_NETWORK_MAC, unique_id)},
-            manufacturer="Broadlink-Controlled",
-            model=self.device_name,
-            name=self.device_name,
+    async def register(self, config_entry, metadata=None):
+        """Create the device registry entry and return its device ID.
+
+        The entry gets the same fields as the device_info of the device's
+        buttons, so it does not matter which of them creates it.
+        """
+        if metadata is None:
+            metadata = ControlledDeviceMetadata(self.mac_address, self.device_name)
+        device_entry = dr.async_get(self.hass).async_get_or_create(
+            config_entry_id=config_entry.entry_id, **metadata.device_info
         )
         _LOGGER.debug(f"Registered controlled device: {self.device_name}")
+        return device_entry.id
 
     async def unregister(self):
         device_registry = dr.async_get(self.hass)
         unique_id = f"{self.mac_address}_{self.device_name}"
-        device_entry = device_registry.async_get((dr.CONNECTION_NETWORK_MAC, unique_id))
+        device_entry = device_registry.async_get_device(
+            identifiers={(dr.CONNECTION_NETWORK_MAC, unique_id)}
+        )
         if device_entry:
             device_registry.async_remove_device(device_entry.id)
             _LOGGER.debug(f"Unregistered controlled device: {self.device_name}")
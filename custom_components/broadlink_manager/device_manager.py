@@ -1,8 +1,35 @@
+import asyncio
 import logging
+import time
+from homeassistant.core import callback
+from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers import device_registry as dr, entity_registry as er
+from .broadlink_hub import async_get_hub_registry
 from .codes_manager import CodesManager
 from .command_button import CommandButton
-from .helpers.utils import format_name
+from .const import (
+    DOMAIN,
+    CONF_DIRECT_SEND,
+    CONF_EXPOSED_COMMANDS,
+    CONF_EXPOSED_DEVICES,
+    CONF_RELOAD_DEBOUNCE,
+    DEFAULT_MACRO_DELAY,
+    DEFAULT_RELOAD_DEBOUNCE,
+    ENTITY_BATCH_SIZE,
+    METRIC_HUB_SEND,
+    METRIC_RELOAD,
+    METRIC_REMOTE_LOOKUP,
+    METRIC_SEND_DIRECT,
+    METRIC_SEND_SERVICE,
+)
+from .controlled_device import ControlledDevice, ControlledDeviceMetadata
+from .hub_connection import HubConnectionError, HubSendError, get_hub_connection
+from .hub_health import get_hub_health
+from .ownership_index import OwnershipIndex
+from .send_queue import SendQueue
+from .startup_snapshot import StartupSnapshot
+from .helpers.metrics import Metrics
+from .helpers.utils import normalize_mac
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -10,93 +37,470 @@ _LOGGER = logging.getLogger(__name__)
 class DeviceManager:
     def __init__(self, hass, mac_address, config_entry):
         self.hass = hass
-        self.mac_address = self._normalize_mac(mac_address)
+        self.mac_address = normalize_mac(mac_address)
         self.config_entry = config_entry
         self.codes_manager = None  # Will be initialized in initialize()
+        self.hub_registry = async_get_hub_registry(hass)
+        self._unsub_hub_listener = None
+        self.health = get_hub_health(hass, self.mac_address)
+        self._unsub_health_listener = None
+        self._async_add_entities = None
+        self._buttons = {}  # unique_id -> CommandButton
+        self._snapshot = {}  # device -> command names at the last sync
+        self._device_metadata = {}  # device -> ControlledDeviceMetadata
+        self.ownership = OwnershipIndex(hass, self.mac_address)
+        self.startup_snapshot = StartupSnapshot(hass, self.mac_address)
+        self._synced_hash = None  # content hash of the codes the buttons show
+        self._sync_lock = asyncio.Lock()
+        self.direct_send = config_entry.options.get(CONF_DIRECT_SEND, False)
+        # Without a selection every command is exposed as a button
+        self.exposed_devices = set(config_entry.options.get(CONF_EXPOSED_DEVICES, []))
+        self.exposed_commands = set(config_entry.options.get(CONF_EXPOSED_COMMANDS, []))
+        self.metrics = Metrics()
+        self.send_queue = SendQueue(
+            hass, self.mac_address, self._async_transmit, self.metrics
+        )
 
     async def initialize(self):
+        await self.ownership.async_load()
+        if not self.ownership.loaded:
+            # First start with an index: adopt what older versions created
+            await self._async_adopt_entities_by_prefix()
+        await self.startup_snapshot.async_load()
+        # With a snapshot the buttons do not need the codes, so they are
+        # parsed in the background instead of delaying the setup
         self.codes_manager = await CodesManager.get_or_create(
-            self.hass, self.mac_address
+            self.hass, self.mac_address, defer_load=self.startup_snapshot.loaded
+        )
+        self.codes_manager.reload_debounce = self.config_entry.options.get(
+            CONF_RELOAD_DEBOUNCE, DEFAULT_RELOAD_DEBOUNCE
         )
         self.codes_manager.set_on_change_callback(self.reload_devices_and_commands)
+        self._unsub_hub_listener = self.hub_registry.async_add_listener(
+            self.mac_address, self._async_hub_updated
+        )
+        self._unsub_health_listener = self.health.async_add_listener(
+            self._async_hub_updated
+        )
+
+    async def async_shutdown(self):
+        """Release the hub listeners and the send queue held by this manager."""
+        await self.send_queue.async_stop()
+        if self._unsub_hub_listener:
+            self._unsub_hub_listener()
+            self._unsub_hub_listener = None
+        if self._unsub_health_listener:
+            self._unsub_health_listener()
+            self._unsub_health_listener = None
+
+    @callback
+    def get_remote_entity_id(self, mac_address=None):
+        """Return the remote entity_id of the Broadlink hub with the given MAC."""
+        hub = self.hub_registry.async_get(mac_address or self.mac_address)
+        return hub.remote_entity_id if hub else None
+
+    @property
+    def hub_available(self):
+        """Whether the hub is registered, its remote entity is available and
+        its circuit breaker is closed."""
+        hub = self.hub_registry.async_get(self.mac_address)
+        return hub is not None and hub.online and self.health.available
+
+    @callback
+    def _async_hub_updated(self):
+        for button in self._buttons.values():
+            if button.hass is not None:
+                button.async_write_ha_state()
+
+    async def async_send_command(
+        self, device_name, command_name, repeats=1, delay_secs=0
+    ):
+        """Queue one command for the hub and wait until it has been sent."""
+        self.health.check()
+        await self.codes_manager.async_wait_loaded()
+        self._check_command(device_name, command_name)
+        await self.send_queue.async_send(
+            [(device_name, command_name)], delay_secs, repeats
+        )
+
+    async def async_send_macro(
+        self, device_name, commands, delay_secs=DEFAULT_MACRO_DELAY, repeats=1
+    ):
+        """Queue an ordered sequence of commands as a single job."""
+        self.health.check()
+        await self.codes_manager.async_wait_loaded()
+        for command_name in commands:
+            self._check_command(device_name, command_name)
+        steps = [(device_name, command_name) for command_name in commands]
+        await self.send_queue.async_send(steps, delay_secs, repeats)
+
+    def _check_command(self, device_name, command_name):
+        if not self.codes_manager.command_exists(device_name, command_name):
+            raise HomeAssistantError(
+                f"Command '{command_name}' not found for device '{device_name}'"
+            )
+
+    async def _async_transmit(self, device_name, command_name):
+        """Transmit a stored command through the hub.
+
+        With the direct_send option the decoded code goes straight to the hub
+        over a pooled connection; toggle codes, missing codes and failures to
+        connect fall back to the remote.send_command service. A failure after
+        the packet went out is raised instead, as the hub may have sent it
+        and toggle codes must not be sent twice. The service call is bounded
+        by the hub's adaptive send timeout, and every outcome feeds the hub's
+        health.
+        """
+        # Jobs queued before the hub went down fail without waiting
+        self.health.check()
+        packet = self.codes_manager.get_code(device_name, command_name)
+        if self.direct_send and isinstance(packet, bytes):
+            start = time.perf_counter()
+            try:
+                await get_hub_connection(self.hass, self.mac_address).async_send(packet)
+            except HubSendError as err:
+                self.health.record_failure(err)
+                raise HomeAssistantError(str(err)) from err
+            except HubConnectionError as err:
+                _LOGGER.warning("%s, falling back to remote.send_command", err)
+            else:
+                self._record_send_latency(METRIC_SEND_DIRECT, start)
+                return
+
+        with self.metrics.timer(METRIC_REMOTE_LOOKUP):
+            remote_entity_id = self.get_remote_entity_id()
+        if not remote_entity_id:
+            _LOGGER.error(
+                "Could not find remote entity for MAC address: %s", self.mac_address
+            )
+            return
+
+        timeout = self.health.send_timeout
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(
+                self.hass.services.async_call(
+                    domain="remote",
+                    service="send_command",
+                    service_data={
+                        "entity_id": remote_entity_id,
+                        "device": device_name,
+                        "command": command_name,
+                    },
+                    blocking=True,
+                ),
+                timeout,
+            )
+        except asyncio.TimeoutError as err:
+            self.health.record_failure(f"no answer within {timeout:.1f} s")
+            raise HomeAssistantError(
+                f"Hub {self.mac_address} did not answer within {timeout:.1f} s"
+            ) from err
+        except HomeAssistantError as err:
+            self.health.record_failure(err)
+            raise
+        self._record_send_latency(METRIC_SEND_SERVICE, start)
+
+    def _record_send_latency(self, metric, start):
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.metrics.record(metric, elapsed_ms)
+        self.health.record_success(METRIC_HUB_SEND, elapsed_ms)
+        _LOGGER.debug(
+            "Sent via %s in %.1f ms (p50 direct %s ms, p50 service %s ms)",
+            metric,
+            elapsed_ms,
+            self.metrics.get(METRIC_SEND_DIRECT).percentile(50),
+            self.metrics.get(METRIC_SEND_SERVICE).percentile(50),
+        )
 
     async def initialize_entities(self, async_add_entities):
-        entities = []
-
-        for device_name in self.codes_manager.get_all_devices():
-            formatted_device_name = format_name(device_name)
-            commands = self.codes_manager.get_device_codes(device_name)
-            for command_name, command_data in commands.items():
-                formatted_command_name = format_name(command_name)
-                unique_id = f"{self.mac_address}_{device_name}_{command_name}"
-                entities.append(
-                    CommandButton(
-                        mac_address=self.mac_address,
-                        device_name=device_name,  # Saving original device name
-                        command_name=command_name,  # Saving original command name
-                        formatted_device_name=formatted_device_name,
-                        formatted_command_name=formatted_command_name,
-                        command_data=command_data,
-                        unique_id=unique_id,
-                        config_entry=self.config_entry,
-                    )
+        self._async_add_entities = async_add_entities
+        self._buttons = {}
+
+        devices = self.startup_snapshot.pop_devices()
+        if devices is None:
+            async with self._sync_lock:
+                await self.codes_manager.async_wait_loaded()
+                self._snapshot = self._snapshot_codes()
+                self._synced_hash = self.codes_manager.content_hash
+                await self._async_add_buttons(
+                    (device_name, command_name)
+                    for device_name, commands in self._snapshot.items()
+                    for command_name in commands
                 )
-        async_add_entities(entities)
+                self._record_snapshot()
+            return
+
+        async with self._sync_lock:
+            self._snapshot = {
+                device_name: set(commands)
+                for device_name, (_, commands) in devices.items()
+            }
+            if self.startup_snapshot.exposure == self._exposure():
+                self._synced_hash = self.startup_snapshot.content_hash
+            await self._async_add_buttons(
+                (
+                    (device_name, command_name)
+                    for device_name, (_, commands) in devices.items()
+                    for command_name in commands
+                ),
+                devices,
+            )
+        if self.codes_manager.loaded:
+            # The codes were loaded before the platform was set up, so their
+            # change notification found no buttons to update
+            await self.reload_devices_and_commands()
+
+    async def _async_add_buttons(self, commands, names=None):
+        """Create and add buttons in batches, yielding to the loop in between.
+
+        names optionally maps devices to their stored [formatted name,
+        {command: formatted name}], saving the formatting at startup.
+        """
+        batch = []
+        registered = set()
+        for device_name, command_name in commands:
+            device_names = names and names[device_name]
+            if device_name not in registered:
+                registered.add(device_name)
+                device_id = await ControlledDevice(
+                    self.hass, self.mac_address, device_name
+                ).register(self.config_entry, self._metadata(device_name, device_names))
+                self.ownership.add_device(device_name, device_id)
+            batch.append(self._create_button(device_name, command_name, device_names))
+            if len(batch) >= ENTITY_BATCH_SIZE:
+                self._async_add_entities(batch)
+                batch = []
+                await asyncio.sleep(0)
+        if batch:
+            self._async_add_entities(batch)
+
+    def is_exposed(self, device_name, command_name):
+        """Return whether a command gets a button entity."""
+        if not self.exposed_devices and not self.exposed_commands:
+            return True
+        return (
+            device_name in self.exposed_devices
+            or f"{device_name}/{command_name}" in self.exposed_commands
+        )
+
+    def _metadata(self, device_name, names=None):
+        """Return the metadata shared by a device's buttons and registry entry."""
+        metadata = self._device_metadata.get(device_name)
+        if metadata is None:
+            metadata = self._device_metadata[device_name] = ControlledDeviceMetadata(
+                self.mac_address, device_name, names and names[0]
+            )
+        return metadata
+
+    def _create_button(self, device_name, command_name, names=None):
+        metadata = self._metadata(device_name, names)
+        unique_id = f"{self.mac_address}_{device_name}_{command_name}"
+        button = CommandButton(
+            metadata, command_name, unique_id, self, names and names[1][command_name]
+        )
+        self._buttons[unique_id] = button
+        return button
+
+    def _exposure(self):
+        """The exposure options, as stored in the startup snapshot."""
+        return {
+            "devices": sorted(self.exposed_devices),
+            "commands": sorted(self.exposed_commands),
+        }
+
+    def _record_snapshot(self):
+        self.startup_snapshot.record(
+            self._synced_hash, self._exposure(), self._snapshot
+        )
+
+    def _snapshot_codes(self):
+        """Return the device -> exposed command names mapping."""
+        return {
+            device_name: {
+                command_name
+                for command_name in self.codes_manager.get_device_codes(device_name)
+                if self.is_exposed(device_name, command_name)
+            }
+            for device_name in self.codes_manager.get_all_devices()
+        }
+
+    async def _remove_button(self, unique_id):
+        button = self._buttons.pop(unique_id, None)
+        entity_registry = er.async_get(self.hass)
+        entity_id = self._owned_entity_id(
+            entity_registry, unique_id, self.ownership.pop_entity(unique_id)
+        )
+        if entity_id:
+            _LOGGER.debug("Removing entity: %s", entity_id)
+            entity_registry.async_remove(entity_id)
+        elif button is not None and button.hass is not None:
+            await button.async_remove(force_remove=True)
+
+    async def _remove_device(self, device_name):
+        self._device_metadata.pop(device_name, None)
+        device_registry = dr.async_get(self.hass)
+        device_id = self.ownership.pop_device(device_name)
+        if device_id and device_registry.async_get(device_id):
+            device_registry.async_remove_device(device_id)
+        else:
+            await ControlledDevice(
+                self.hass, self.mac_address, device_name
+            ).unregister()
+
+    @staticmethod
+    def _owned_entity_id(entity_registry, unique_id, entity_id):
+        """Return the current entity_id of an owned button, following renames."""
+        if entity_id and entity_registry.async_get(entity_id):
+            return entity_id
+        return entity_registry.async_get_entity_id("button", DOMAIN, unique_id)
 
     async def remove_entities(self):
-        """Remove existing entities related to the Broadlink device, but not the main Broadlink hub."""
+        """Remove the devices and buttons this integration created, but not the main Broadlink hub.
+
+        Only the objects recorded in the ownership index are touched, so the
+        cost does not depend on the size of the registries.
+        """
         _LOGGER.debug("Cleaning up devices and buttons for MAC: %s", self.mac_address)
 
+        if self.ownership.loaded:
+            self._remove_owned_entities()
+        else:
+            # The index could not be built (initialize did not run)
+            self._remove_entities_by_prefix()
+        await self.ownership.async_clear()
+
+        self._buttons = {}
+        self._snapshot = {}
+        self._synced_hash = None
+        self._device_metadata = {}
+        self._async_add_entities = None
+
+        _LOGGER.debug(
+            "Finished cleaning up devices and buttons for MAC: %s", self.mac_address
+        )
+
+    def _remove_owned_entities(self):
         device_registry = dr.async_get(self.hass)
         entity_registry = er.async_get(self.hass)
 
-        # Only remove devices and entities that were created by this custom integration
-        devices_to_remove = [
-            device_entry
-            for device_entry in device_registry.devices.values()
-            if any(
-                identifier[1] != self.mac_address
-                and identifier[1].startswith(self.mac_address + "_")
-                for identifier in device_entry.identifiers
-            )
-        ]
+        for unique_id, entity_id in self.ownership.entities.items():
+            entity_id = self._owned_entity_id(entity_registry, unique_id, entity_id)
+            if entity_id:
+                _LOGGER.debug("Removing entity: %s", entity_id)
+                entity_registry.async_remove(entity_id)
 
-        for device_entry in devices_to_remove:
-            _LOGGER.debug("Removing device: %s", device_entry.name)
-            device_registry.async_remove_device(device_entry.id)
+        for device_name, device_id in self.ownership.devices.items():
+            if device_registry.async_get(device_id):
+                _LOGGER.debug("Removing device: %s", device_name)
+                device_registry.async_remove_device(device_id)
+
+    def _find_entities_by_prefix(self):
+        """Scan the registries for devices and entities with the hub's MAC prefix.
 
-        entities_to_remove = [
+        Returns ({device name: device entry}, [entity entries]).
+        """
+        prefix = self.mac_address + "_"
+        # Only devices and entities that were created by this custom integration
+        devices = {
+            identifier[1][len(prefix) :]: device_entry
+            for device_entry in dr.async_get(self.hass).devices.values()
+            for identifier in device_entry.identifiers
+            if identifier[1] != self.mac_address and identifier[1].startswith(prefix)
+        }
+        entities = [
             entity_entry
-            for entity_entry in entity_registry.entities.values()
-            if entity_entry.unique_id.startswith(self.mac_address + "_")
+            for entity_entry in er.async_get(self.hass).entities.values()
+            if entity_entry.unique_id.startswith(prefix)
         ]
+        return devices, entities
+
+    async def _async_adopt_entities_by_prefix(self):
+        devices, entities = self._find_entities_by_prefix()
+        _LOGGER.debug(
+            "Adopting %d devices and %d entities for MAC: %s",
+            len(devices),
+            len(entities),
+            self.mac_address,
+        )
+        await self.ownership.async_adopt(
+            {
+                device_name: device_entry.id
+                for device_name, device_entry in devices.items()
+            },
+            {
+                entity_entry.unique_id: entity_entry.entity_id
+                for entity_entry in entities
+            },
+        )
+
+    def _remove_entities_by_prefix(self):
+        device_registry = dr.async_get(self.hass)
+        entity_registry = er.async_get(self.hass)
+        devices_to_remove, entities_to_remove = self._find_entities_by_prefix()
+
+        for device_entry in devices_to_remove.values():
+            _LOGGER.debug("Removing device: %s", device_entry.name)
+            device_registry.async_remove_device(device_entry.id)
 
         for entity_entry in entities_to_remove:
             _LOGGER.debug("Removing entity: %s", entity_entry.entity_id)
             entity_registry.async_remove(entity_entry.entity_id)
 
-        _LOGGER.debug(
-            "Finished cleaning up devices and buttons for MAC: %s", self.mac_address
-        )
-
     async def reload_devices_and_commands(self):
-        """Reload devices and commands when the codes file changes."""
-        _LOGGER.info(
-            "Reloading devices and commands due to file change for MAC: %s",
-            self.mac_address,
-        )
+        """Apply changes in the codes file to the existing devices and buttons."""
+        if self._async_add_entities is None:
+            # The button platform has not been set up yet; it will pick up
+            # the current codes when it is.
+            return
 
-        # Ensure existing entities are removed before re-adding
-        await self.remove_entities()
+        async with self._sync_lock:
+            if self.codes_manager.content_hash == self._synced_hash:
+                # The buttons were already built from these codes
+                return
 
-        # Re-add the entities
-        platforms = self.hass.helpers.entity_platform.async_get_platforms(
-            self.hass, "broadlink_manager"
-        )
-        for platform in platforms:
-            await platform.async_setup_entry(self.config_entry)
+            _LOGGER.info(
+                "Reloading devices and commands due to file change for MAC: %s",
+                self.mac_address,
+            )
 
-    @staticmethod
-    def _normalize_mac(mac: str) -> str:
-        """Normalize a MAC address by removing colons and converting to lowercase."""
-        return mac.replace(":", "").lower()
+            with self.metrics.timer(METRIC_RELOAD):
+                await self._async_sync_entities()
+
+    async def _async_sync_entities(self):
+        """Diff the codes against the last snapshot and update the buttons."""
+        old_snapshot = self._snapshot
+        new_snapshot = self._snapshot_codes()
+        self._snapshot = new_snapshot
+        self._synced_hash = self.codes_manager.content_hash
+
+        new_commands = []
+        removed = 0
+        for device_name in old_snapshot.keys() - new_snapshot.keys():
+            for command_name in old_snapshot[device_name]:
+                await self._remove_button(
+                    f"{self.mac_address}_{device_name}_{command_name}"
+                )
+                removed += 1
+            await self._remove_device(device_name)
+
+        for device_name, commands in new_snapshot.items():
+            old_commands = old_snapshot.get(device_name, set())
+            for command_name in old_commands - commands:
+                await self._remove_button(
+                    f"{self.mac_address}_{device_name}_{command_name}"
+                )
+                removed += 1
+            # Changed codes need no entity update, buttons send from the cache
+            for command_name in commands - old_commands:
+                new_commands.append((device_name, command_name))
+
+        await self._async_add_buttons(new_commands)
+        self._record_snapshot()
+
+        _LOGGER.debug(
+            "Reload for MAC %s: %d added, %d removed",
+            self.mac_address,
+            len(new_commands),
+            removed,
+        )
@@ -0,0 +1,30 @@
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from .const import DOMAIN
+
+TO_REDACT = {"mac_address"}
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry):
+    """Return timing and load statistics for a config entry."""
+    device_manager = hass.data[DOMAIN][entry.entry_id]
+    codes_manager = device_manager.codes_manager
+    await codes_manager.async_wait_loaded()
+    return {
+        "entry": {
+            "data": async_redact_data(dict(entry.data), TO_REDACT),
+            "options": dict(entry.options),
+        },
+        "metrics": device_manager.metrics.summary(),
+        "send_queue": {"pending": device_manager.send_queue.pending},
+        "hub_health": device_manager.health.summary(),
+        "codes": {
+            "devices": len(codes_manager.get_all_devices()),
+            "version": codes_manager.version,
+            "load_stats": codes_manager.load_stats,
+            "metrics": codes_manager.metrics.summary(),
+            "memory": codes_manager.memory_usage(),
+            "shared_pool": codes_manager.code_pool.memory_usage(),
+        },
+    }
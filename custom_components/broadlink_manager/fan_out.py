@@ -0,0 +1,106 @@
+import asyncio
+import logging
+import time
+from homeassistant.exceptions import HomeAssistantError
+from .const import DOMAIN, DEFAULT_HUB_TIMEOUT
+from .device_manager import DeviceManager
+from .helpers.utils import normalize_mac
+
+_LOGGER = logging.getLogger(__name__)
+
+RESULT_OK = "ok"
+RESULT_TIMEOUT = "timeout"
+RESULT_ERROR = "error"
+RESULT_MISSING = "missing"
+
+
+def resolve_hubs(hass, device_name, command_name, mac_addresses=None):
+    """Return {MAC: DeviceManager or None} for the hubs asked for.
+
+    Without mac_addresses every loaded hub that knows the command is used.
+    With them, hubs that are not loaded or lack the command map to None.
+    """
+    device_managers = {
+        device_manager.mac_address: device_manager
+        for device_manager in hass.data.get(DOMAIN, {}).values()
+        if isinstance(device_manager, DeviceManager)
+    }
+    if mac_addresses is None:
+        candidates = device_managers
+    else:
+        candidates = {
+            normalize_mac(mac_address): device_managers.get(normalize_mac(mac_address))
+            for mac_address in mac_addresses
+        }
+    return {
+        mac_address: (
+            device_manager
+            if device_manager is not None
+            and device_manager.codes_manager.command_exists(device_name, command_name)
+            else None
+        )
+        for mac_address, device_manager in candidates.items()
+        if device_manager is not None or mac_addresses is not None
+    }
+
+
+async def async_fan_out(
+    hass,
+    device_name,
+    command_name,
+    mac_addresses=None,
+    timeout=DEFAULT_HUB_TIMEOUT,
+    repeats=1,
+    delay_secs=0,
+):
+    """Send one command through several hubs at once.
+
+    Each hub sends through its own queue, bounded by timeout, so the call
+    takes as long as the slowest hub rather than the sum of all of them.
+    Returns {MAC: {"result", "elapsed_ms"[, "error"]}}.
+    """
+    for device_manager in hass.data.get(DOMAIN, {}).values():
+        if isinstance(device_manager, DeviceManager):
+            await device_manager.codes_manager.async_wait_loaded()
+    hubs = resolve_hubs(hass, device_name, command_name, mac_addresses)
+    if not any(hubs.values()):
+        raise HomeAssistantError(
+            f"No hub has command '{command_name}' for device '{device_name}'"
+        )
+
+    async def _async_send(device_manager):
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(
+                device_manager.async_send_command(
+                    device_name, command_name, repeats=repeats, delay_secs=delay_secs
+                ),
+                timeout,
+            )
+        except asyncio.TimeoutError:
+            result = {"result": RESULT_TIMEOUT}
+        except Exception as err:  # pylint: disable=broad-except
+            result = {"result": RESULT_ERROR, "error": str(err)}
+        else:
+            result = {"result": RESULT_OK}
+        result["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        return result
+
+    targets = [
+        (mac_address, device_manager)
+        for mac_address, device_manager in hubs.items()
+        if device_manager is not None
+    ]
+    sent = await asyncio.gather(
+        *(_async_send(device_manager) for _, device_manager in targets)
+    )
+    results = {
+        mac_address: {"result": RESULT_MISSING, "elapsed_ms": 0.0}
+        for mac_address, device_manager in hubs.items()
+        if device_manager is None
+    }
+    results.update(
+        (mac_address, result) for (mac_address, _), result in zip(targets, sent)
+    )
+    _LOGGER.debug("Fan-out of %s/%s: %s", device_name, command_name, results)
+    return results
@@ -1,26 +1,111 @@
+import asyncio
+import logging
+import os
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+from ..const import DATA_FILE_WATCHER
+
+_LOGGER = logging.getLogger(__name__)
 
 
 class FileWatcher:
-    def __init__(self, file_path, on_change_callback):
-        self.file_path = file_path
-        self.on_change_callback = on_change_callback
-        self._start_watcher()
+    """Watch a directory with one observer and route events by file name."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._callbacks = {}
+        self._observer = None
+        # Held on the event loop across the executor hop of start/stop, so
+        # concurrent setups cannot start two observers
+        self.lock = asyncio.Lock()
+
+    @property
+    def is_running(self):
+        return self._observer is not None
+
+    @property
+    def is_idle(self):
+        return not self._callbacks
 
-    def _start_watcher(self):
-        event_handler = self._FileChangeHandler(self)
+    def register(self, file_name, on_change_callback):
+        """Call on_change_callback (from the observer thread) when file_name changes."""
+        self._callbacks[file_name] = on_change_callback
+
+        def unregister():
+            if self._callbacks.get(file_name) is on_change_callback:
+                del self._callbacks[file_name]
+
+        return unregister
+
+    def start(self):
+        """Start the observer. Blocking, run it in the executor."""
+        if self._observer is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
         observer = Observer()
-        observer.schedule(event_handler, path=self.file_path, recursive=False)
+        observer.schedule(
+            self._FileChangeHandler(self), path=self.directory, recursive=False
+        )
         observer.start()
+        self._observer = observer
+        _LOGGER.debug("Started file watcher for %s", self.directory)
+
+    def stop(self):
+        """Stop the observer and wait for its thread. Blocking."""
+        observer, self._observer = self._observer, None
+        if observer is None:
+            return
+        observer.stop()
+        observer.join()
+        _LOGGER.debug("Stopped file watcher for %s", self.directory)
 
-    def _on_file_change(self, event):
-        if event.src_path == self.file_path:
-            self.on_change_callback()
+    def _on_file_change(self, path):
+        on_change_callback = self._callbacks.get(os.path.basename(path))
+        if on_change_callback:
+            on_change_callback()
 
     class _FileChangeHandler(FileSystemEventHandler):
         def __init__(self, watcher):
             self.watcher = watcher
 
         def on_modified(self, event):
-            self.watcher._on_file_change(event)
+            if not event.is_directory:
+                self.watcher._on_file_change(event.src_path)
+
+        def on_created(self, event):
+            if not event.is_directory:
+                self.watcher._on_file_change(event.src_path)
+
+        def on_moved(self, event):
+            # Store writes a temporary file and renames it over the target
+            if not event.is_directory:
+                self.watcher._on_file_change(event.dest_path)
+
+
+async def async_get_file_watcher(hass):
+    """Return the shared watcher for the .storage directory, starting it if needed."""
+    watcher = hass.data.get(DATA_FILE_WATCHER)
+    if watcher is None:
+        watcher = FileWatcher(hass.config.path(".storage"))
+        hass.data[DATA_FILE_WATCHER] = watcher
+
+        async def _async_stop(_event):
+            await async_stop_file_watcher(hass)
+
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, _async_stop)
+    async with watcher.lock:
+        if not watcher.is_running:
+            await hass.async_add_executor_job(watcher.start)
+    return watcher
+
+
+async def async_stop_file_watcher(hass, only_if_idle=False):
+    """Stop the shared watcher, optionally only when nothing is registered."""
+    watcher = hass.data.get(DATA_FILE_WATCHER)
+    if watcher is None:
+        return
+    async with watcher.lock:
+        if only_if_idle and not watcher.is_idle:
+            return
+        await hass.async_add_executor_job(watcher.stop)
@@ -0,0 +1,67 @@
+import time
+from collections import deque
+from contextlib import contextmanager
+from ..const import METRICS_WINDOW
+
+
+def _nearest_rank(ordered, pct):
+    rank = round(pct / 100 * len(ordered)) - 1
+    return ordered[max(0, min(len(ordered) - 1, rank))]
+
+
+class TimingStats:
+    """Durations (ms) of the most recent samples of one operation."""
+
+    def __init__(self, window=METRICS_WINDOW):
+        self._samples = deque(maxlen=window)
+        self.count = 0
+
+    def record(self, duration_ms):
+        self._samples.append(duration_ms)
+        self.count += 1
+
+    def percentile(self, pct):
+        """Return the nearest-rank percentile of the window, or None if empty."""
+        if not self._samples:
+            return None
+        return _nearest_rank(sorted(self._samples), pct)
+
+    def summary(self):
+        if not self._samples:
+            return {"count": self.count}
+        ordered = sorted(self._samples)
+        return {
+            "count": self.count,
+            "p50": round(_nearest_rank(ordered, 50), 3),
+            "p95": round(_nearest_rank(ordered, 95), 3),
+            "p99": round(_nearest_rank(ordered, 99), 3),
+            "max": round(ordered[-1], 3),
+        }
+
+
+class Metrics:
+    """Named timing statistics for one hub."""
+
+    def __init__(self):
+        self._stats = {}
+
+    def get(self, name):
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats[name] = TimingStats()
+        return stats
+
+    def record(self, name, duration_ms):
+        self.get(name).record(duration_ms)
+
+    @contextmanager
+    def timer(self, name):
+        """Record how long the wrapped block takes, also when it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - start) * 1000)
+
+    def summary(self):
+        return {name: stats.summary() for name, stats in self._stats.items()}
@@ -1,3 +1,8 @@
+import base64
+from functools import lru_cache
+
+
+@lru_cache(maxsize=4096)
 def format_name(name: str) -> str:
     """Transform a name by replacing underscores with spaces and capitalizing words, only if they have no existing capitalization."""
 
@@ -13,3 +18,8 @@ def format_name(name: str) -> str:
 def normalize_mac(mac: str) -> str:
     """Normalize a MAC address by removing colons and converting to lowercase."""
     return mac.replace(":", "").lower()
+
+
+def decode_code(code: str) -> bytes:
+    """Decode a base64 Broadlink code, tolerating missing padding."""
+    return base64.b64decode(code + "=" * (-len(code) % 4))
@@ -0,0 +1,134 @@
+import asyncio
+import broadlink
+import logging
+import time
+from functools import partial
+from broadlink.exceptions import AuthorizationError, BroadlinkException
+from .const import (
+    BROADLINK_DOMAIN,
+    DATA_CONNECTION_POOL,
+    DIRECT_SEND_BACKOFF_MAX,
+    DIRECT_SEND_BACKOFF_MIN,
+)
+from .helpers.utils import normalize_mac
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class HubConnectionError(Exception):
+    """The hub could not be reached over a direct connection."""
+
+
+class HubSendError(HubConnectionError):
+    """Sending failed after the packet went out; the hub may have sent it."""
+
+
+class HubConnection:
+    """An authenticated python-broadlink session to one hub, reused across sends."""
+
+    def __init__(self, hass, mac_address):
+        self.hass = hass
+        self.mac_address = normalize_mac(mac_address)
+        self._api = None
+        self._lock = asyncio.Lock()
+        self._failures = 0
+        self._retry_at = 0.0
+
+    def _find_broadlink_entry(self):
+        """Return the core Broadlink config entry that owns this hub."""
+        for entry in self.hass.config_entries.async_entries(BROADLINK_DOMAIN):
+            if normalize_mac(entry.unique_id or entry.data.get("mac", "")) == (
+                self.mac_address
+            ):
+                return entry
+        return None
+
+    async def _async_connect(self):
+        entry = self._find_broadlink_entry()
+        if entry is None:
+            raise HubConnectionError(
+                f"No Broadlink config entry found for hub {self.mac_address}"
+            )
+        api = broadlink.gendevice(
+            entry.data["type"],
+            (entry.data["host"], 80),
+            bytes.fromhex(self.mac_address),
+            name=entry.title,
+        )
+        api.timeout = entry.data.get("timeout", api.timeout)
+        await self.hass.async_add_executor_job(api.auth)
+        self._api = api
+        _LOGGER.debug("Authenticated direct connection to hub %s", self.mac_address)
+
+    async def async_send(self, packet):
+        """Transmit a decoded code, (re)connecting with exponential backoff."""
+        async with self._lock:
+            if time.monotonic() < self._retry_at:
+                raise HubConnectionError(
+                    f"Hub {self.mac_address} is backing off after {self._failures} failures"
+                )
+            sending = False
+            try:
+                if self._api is None:
+                    await self._async_connect()
+                try:
+                    sending = True
+                    await self.hass.async_add_executor_job(self._api.send_data, packet)
+                except AuthorizationError:
+                    # The session key expired and the hub refused the packet,
+                    # authenticate again and retry once
+                    sending = False
+                    await self.hass.async_add_executor_job(self._api.auth)
+                    sending = True
+                    await self.hass.async_add_executor_job(self._api.send_data, packet)
+            except (OSError, BroadlinkException, HubConnectionError) as err:
+                self._record_failure()
+                if sending and not isinstance(err, AuthorizationError):
+                    # The packet went out; a timeout waiting for the reply
+                    # does not mean the hub did not transmit it
+                    raise HubSendError(
+                        f"Direct send to hub {self.mac_address} failed: {err}"
+                    ) from err
+                raise HubConnectionError(
+                    f"Direct connection to hub {self.mac_address} failed: {err}"
+                ) from err
+            self._failures = 0
+            self._retry_at = 0.0
+
+    def _record_failure(self):
+        self._api = None
+        self._failures += 1
+        backoff = min(
+            DIRECT_SEND_BACKOFF_MAX,
+            DIRECT_SEND_BACKOFF_MIN * 2 ** (self._failures - 1),
+        )
+        self._retry_at = time.monotonic() + backoff
+
+    async def async_probe(self, timeout):
+        """Check that the hub answers a discovery hello, without authenticating.
+
+        Returns False when the hub's address is unknown and raises
+        HubConnectionError when it does not answer. Sends are not blocked.
+        """
+        entry = self._find_broadlink_entry()
+        if entry is None:
+            return False
+        try:
+            await self.hass.async_add_executor_job(
+                partial(broadlink.hello, entry.data["host"], timeout=timeout)
+            )
+        except (OSError, BroadlinkException) as err:
+            raise HubConnectionError(
+                f"Hub {self.mac_address} did not answer a probe: {err}"
+            ) from err
+        return True
+
+
+def get_hub_connection(hass, mac_address):
+    """Return the pooled connection for a hub, creating it on first use."""
+    pool = hass.data.setdefault(DATA_CONNECTION_POOL, {})
+    mac_address = normalize_mac(mac_address)
+    connection = pool.get(mac_address)
+    if connection is None:
+        connection = pool[mac_address] = HubConnection(hass, mac_address)
+    return connection
@@ -0,0 +1,192 @@
+import logging
+import time
+from homeassistant.core import callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.event import async_call_later
+from .const import (
+    DATA_HUB_HEALTH,
+    DEFAULT_HUB_TIMEOUT,
+    HUB_BREAKER_COOLDOWN,
+    HUB_FAILURE_THRESHOLD,
+    HUB_PROBE_INTERVAL,
+    HUB_PROBE_INTERVAL_DOWN,
+    HUB_PROBE_INTERVAL_UNKNOWN,
+    HUB_PROBE_TIMEOUT,
+    HUB_TIMEOUT_FACTOR,
+    HUB_TIMEOUT_MIN,
+    METRIC_HUB_PROBE,
+    METRIC_HUB_SEND,
+)
+from .hub_connection import HubConnectionError, get_hub_connection
+from .helpers.metrics import Metrics
+from .helpers.utils import normalize_mac
+
+_LOGGER = logging.getLogger(__name__)
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class HubUnavailableError(HomeAssistantError):
+    """A send was refused because the hub's circuit breaker is open."""
+
+
+class HubHealth:
+    """Liveness, latency and circuit breaker of one hub.
+
+    Sends and background probes report their outcome here. After
+    HUB_FAILURE_THRESHOLD failures in a row the breaker opens: sends fail at
+    once and the hub's buttons are unavailable. Probes keep running and the
+    first answer closes the breaker again. When the hub cannot be probed
+    (its address is unknown), one trial send is let through every
+    HUB_BREAKER_COOLDOWN seconds instead, and probing is retried every
+    HUB_PROBE_INTERVAL_UNKNOWN seconds in case the address became known.
+    """
+
+    def __init__(self, hass, mac_address):
+        self.hass = hass
+        self.mac_address = normalize_mac(mac_address)
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self.last_error = None
+        self.metrics = Metrics()
+        self.can_probe = True
+        self._last_success = 0.0
+        self._retry_at = 0.0
+        self._listeners = []
+        self._cancel_probe = None
+        self._probing = False  # a probe is awaiting the hub
+
+    @property
+    def available(self):
+        return self.state != STATE_OPEN
+
+    @property
+    def send_timeout(self):
+        """Seconds a send may take, adapted to the hub's recent latency."""
+        p95 = self.metrics.get(METRIC_HUB_SEND).percentile(95)
+        if p95 is None:
+            return DEFAULT_HUB_TIMEOUT
+        return min(
+            DEFAULT_HUB_TIMEOUT, max(HUB_TIMEOUT_MIN, p95 * HUB_TIMEOUT_FACTOR / 1000)
+        )
+
+    @callback
+    def async_add_listener(self, update_callback):
+        """Call update_callback when the hub goes down or comes back.
+
+        Probing runs while the hub has listeners. Returns a function that
+        removes the listener.
+        """
+        self._listeners.append(update_callback)
+        # A running probe schedules the next one itself when it ends
+        if self._cancel_probe is None and not self._probing:
+            self._schedule_probe()
+
+        @callback
+        def _remove_listener():
+            self._listeners.remove(update_callback)
+            if not self._listeners and self._cancel_probe:
+                self._cancel_probe()
+                self._cancel_probe = None
+
+        return _remove_listener
+
+    def check(self):
+        """Raise HubUnavailableError while the breaker is open."""
+        if self.state != STATE_OPEN:
+            return
+        if self.can_probe or time.monotonic() < self._retry_at:
+            raise HubUnavailableError(
+                f"Hub {self.mac_address} is unreachable ({self.last_error})"
+            )
+        # No probe will close the breaker, so let one trial send through
+        self._set_state(STATE_HALF_OPEN)
+
+    def record_success(self, metric, elapsed_ms):
+        self.metrics.record(metric, elapsed_ms)
+        self.failures = 0
+        self._last_success = time.monotonic()
+        if self.state != STATE_CLOSED:
+            _LOGGER.info("Hub %s is reachable again", self.mac_address)
+            self.last_error = None
+            self._set_state(STATE_CLOSED)
+
+    def record_failure(self, err):
+        self.failures += 1
+        self.last_error = str(err)
+        if self.state == STATE_HALF_OPEN or (
+            self.state == STATE_CLOSED and self.failures >= HUB_FAILURE_THRESHOLD
+        ):
+            _LOGGER.warning(
+                "Hub %s failed %d times in a row, failing sends until it answers: %s",
+                self.mac_address,
+                self.failures,
+                err,
+            )
+            self._retry_at = time.monotonic() + HUB_BREAKER_COOLDOWN
+            self._set_state(STATE_OPEN)
+
+    def summary(self):
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "send_timeout": round(self.send_timeout, 3),
+            "can_probe": self.can_probe,
+            "metrics": self.metrics.summary(),
+        }
+
+    def _set_state(self, state):
+        self.state = state
+        for update_callback in list(self._listeners):
+            update_callback()
+
+    @callback
+    def _schedule_probe(self):
+        if not self.can_probe:
+            interval = HUB_PROBE_INTERVAL_UNKNOWN
+        elif self.state == STATE_OPEN:
+            interval = HUB_PROBE_INTERVAL_DOWN
+        else:
+            interval = HUB_PROBE_INTERVAL
+        self._cancel_probe = async_call_later(self.hass, interval, self._async_probe)
+
+    async def _async_probe(self, _now):
+        self._cancel_probe = None
+        if (
+            self.state == STATE_CLOSED
+            and time.monotonic() - self._last_success < HUB_PROBE_INTERVAL
+        ):
+            # A recent send already showed that the hub answers
+            self._schedule_probe()
+            return
+
+        start = time.perf_counter()
+        self._probing = True
+        try:
+            self.can_probe = await get_hub_connection(
+                self.hass, self.mac_address
+            ).async_probe(HUB_PROBE_TIMEOUT)
+        except HubConnectionError as err:
+            self.record_failure(err)
+        else:
+            if self.can_probe:
+                self.record_success(
+                    METRIC_HUB_PROBE, (time.perf_counter() - start) * 1000
+                )
+        finally:
+            self._probing = False
+        if self._listeners and self._cancel_probe is None:
+            self._schedule_probe()
+
+
+def get_hub_health(hass, mac_address):
+    """Return the health tracker of a hub, creating it on first use."""
+    trackers = hass.data.setdefault(DATA_HUB_HEALTH, {})
+    mac_address = normalize_mac(mac_address)
+    health = trackers.get(mac_address)
+    if health is None:
+        health = trackers[mac_address] = HubHealth(hass, mac_address)
+    return health
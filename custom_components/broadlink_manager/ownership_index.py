@@ -0,0 +1,71 @@
+import logging
+from homeassistant.helpers.storage import Store
+from .const import DOMAIN, OWNERSHIP_SAVE_DELAY
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class OwnershipIndex:
+    """The devices and button entities created for one hub, persisted.
+
+    Cleanup removes exactly what is listed here instead of scanning the
+    whole device and entity registries for the hub's MAC prefix.
+    """
+
+    def __init__(self, hass, mac_address):
+        self.hass = hass
+        self.mac_address = mac_address
+        self.store = Store(hass, 1, f"{DOMAIN}_{mac_address}_owned")
+        self.devices = {}  # device name -> device registry id
+        self.entities = {}  # button unique_id -> entity_id
+        self.loaded = False  # False until the index is known to be complete
+
+    async def async_load(self):
+        data = await self.store.async_load()
+        if data is None:
+            return
+        self.devices = data.get("devices", {})
+        self.entities = data.get("entities", {})
+        self.loaded = True
+
+    async def async_adopt(self, devices, entities):
+        """Record objects created before the index existed and store it now."""
+        self.devices.update(devices)
+        self.entities.update(entities)
+        self.loaded = True
+        await self.store.async_save(self._data_to_save())
+
+    def add_device(self, device_name, device_id):
+        if self.devices.get(device_name) != device_id:
+            self.devices[device_name] = device_id
+            self._schedule_save()
+
+    def pop_device(self, device_name):
+        device_id = self.devices.pop(device_name, None)
+        if device_id is not None:
+            self._schedule_save()
+        return device_id
+
+    def add_entity(self, unique_id, entity_id):
+        if self.entities.get(unique_id) != entity_id:
+            self.entities[unique_id] = entity_id
+            self._schedule_save()
+
+    def pop_entity(self, unique_id):
+        entity_id = self.entities.pop(unique_id, None)
+        if entity_id is not None:
+            self._schedule_save()
+        return entity_id
+
+    async def async_clear(self):
+        """Forget every owned object and write the empty index right away."""
+        self.devices = {}
+        self.entities = {}
+        self.loaded = True
+        await self.store.async_save(self._data_to_save())
+
+    def _schedule_save(self):
+        self.store.async_delay_save(self._data_to_save, OWNERSHIP_SAVE_DELAY)
+
+    def _data_to_save(self):
+        return {"devices": self.devices, "entities": self.entities}
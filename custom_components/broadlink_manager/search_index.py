@@ -0,0 +1,221 @@
+import bisect
+import heapq
+import re
+from .const import SEARCH_LIMIT
+from .helpers.utils import format_name
+
+_SPLIT = re.compile(r"[^0-9a-z]+")
+_WORDS = re.compile(r"[A-Z]?[a-z]+|[A-Z]+(?![a-z])|\d+")
+
+# A matched device stands for all its commands; rough size for ordering words
+SEARCH_DEVICE_WEIGHT = 20
+# Prefixes whose matches are kept between queries
+SEARCH_CACHE_SIZE = 128
+
+
+def tokenize(name):
+    """Return the search tokens of a device or command name.
+
+    Tokens are the lowercased words of the raw name, its camelCase parts and
+    its format_name() form, plus both full names, so "livingRoom_TV" is
+    found by "living", "room", "tv", "living room" or "livingroom_t".
+    """
+    lower = name.lower()
+    formatted = format_name(name).lower()
+    tokens = {lower, formatted}
+    tokens.update(_SPLIT.split(lower))
+    tokens.update(formatted.split())
+    tokens.update(word.lower() for word in _WORDS.findall(name))
+    tokens.discard("")
+    return tokens
+
+
+class SearchIndex:
+    """Prefix/token index over the device and command names of one hub.
+
+    Device names and (device, command) pairs are indexed under their own
+    tokens only; a command also matches the words of its device name, which
+    is resolved at query time, so multi-word queries can mix both. Tokens
+    are kept sorted so all tokens with a given prefix are found by
+    bisection.
+    """
+
+    def __init__(self):
+        self._device_postings = {}  # token -> set of device names
+        self._command_postings = {}  # token -> set of (device, command)
+        self._tokens = []  # sorted tokens of both posting maps
+        self._devices = {}  # device -> set of command names
+        self._name_tokens = {}  # name -> frozenset, shared by equal names
+        self._name_refs = {}  # name -> number of postings under its tokens
+        self._prefix_cache = {}  # prefix -> _prefix_matches() result
+
+    def build(self, codes):
+        """Index the device -> commands mapping from scratch."""
+        for device_name, commands in codes.items():
+            self.add_device(device_name, commands)
+
+    def add_device(self, device_name, commands=()):
+        if device_name not in self._devices:
+            self._devices[device_name] = set()
+            self._post(self._device_postings, device_name, device_name)
+        for command_name in commands:
+            self.add(device_name, command_name)
+
+    def add(self, device_name, command_name):
+        self.add_device(device_name)
+        commands = self._devices[device_name]
+        if command_name not in commands:
+            commands.add(command_name)
+            self._post(
+                self._command_postings, command_name, (device_name, command_name)
+            )
+
+    def remove(self, device_name, command_name):
+        commands = self._devices.get(device_name)
+        if commands is not None and command_name in commands:
+            commands.discard(command_name)
+            self._unpost(
+                self._command_postings, command_name, (device_name, command_name)
+            )
+
+    def remove_device(self, device_name):
+        commands = self._devices.pop(device_name, None)
+        if commands is None:
+            return
+        for command_name in commands:
+            self._unpost(
+                self._command_postings, command_name, (device_name, command_name)
+            )
+        self._unpost(self._device_postings, device_name, device_name)
+
+    def rename_device(self, old_name, new_name):
+        commands = self._devices.get(old_name)
+        if commands is None:
+            return
+        commands = set(commands)
+        self.remove_device(old_name)
+        self.remove_device(new_name)
+        self.add_device(new_name, commands)
+
+    def search(self, query, limit=SEARCH_LIMIT, device_name=None):
+        """Return up to limit (device, command) keys matching every query word.
+
+        A word matches a key when it is a prefix of a token of the device
+        or command name. command is None for a device match. Keys with more
+        exact token matches rank first, then by name.
+        """
+        return [key for _, key in self.search_ranked(query, limit, device_name)]
+
+    def search_ranked(self, query, limit=SEARCH_LIMIT, device_name=None):
+        """Like search(), but return (rank, key) pairs.
+
+        Ranks sort like the results and compare across indexes, so results
+        of several hubs can be merged.
+        """
+        words = [word for word in _SPLIT.split(query.lower()) if word]
+        if not words:
+            return []
+        matches = sorted(
+            (self._prefix_matches(word) for word in words), key=lambda match: match[0]
+        )
+
+        # Expand the most selective word into candidate keys, then filter
+        _, devices, commands = matches[0]
+        candidates = set(commands)
+        for found_device in devices:
+            candidates.add((found_device, None))
+            candidates.update(
+                (found_device, command_name)
+                for command_name in self._devices[found_device]
+            )
+        for _, devices, commands in matches[1:]:
+            candidates = {
+                key for key in candidates if key[0] in devices or key in commands
+            }
+            if not candidates:
+                return []
+        if device_name is not None:
+            candidates = {key for key in candidates if key[0] == device_name}
+
+        tokens_for = self._tokens_for
+
+        def rank(key):
+            device_tokens = tokens_for(key[0])
+            command_tokens = tokens_for(key[1]) if key[1] is not None else ()
+            return (
+                -sum(word in device_tokens or word in command_tokens for word in words),
+                key[0],
+                key[1] is not None,
+                key[1] or "",
+            )
+
+        return heapq.nsmallest(limit, ((rank(key), key) for key in candidates))
+
+    def _prefix_matches(self, prefix):
+        """Return (size, device names, command keys) for tokens with prefix.
+
+        A single posting set is returned as it is, without copying. Results
+        are cached until the next change, as a query is typed word by word.
+        """
+        cached = self._prefix_cache.get(prefix)
+        if cached is not None:
+            return cached
+        start = bisect.bisect_left(self._tokens, prefix)
+        end = bisect.bisect_left(self._tokens, prefix + "\uffff", start)
+        device_sets = []
+        command_sets = []
+        for token in self._tokens[start:end]:
+            if token in self._device_postings:
+                device_sets.append(self._device_postings[token])
+            if token in self._command_postings:
+                command_sets.append(self._command_postings[token])
+        devices = device_sets[0] if len(device_sets) == 1 else set().union(*device_sets)
+        commands = (
+            command_sets[0] if len(command_sets) == 1 else set().union(*command_sets)
+        )
+        size = len(devices) * SEARCH_DEVICE_WEIGHT + len(commands)
+        if len(self._prefix_cache) >= SEARCH_CACHE_SIZE:
+            self._prefix_cache.clear()
+        self._prefix_cache[prefix] = (size, devices, commands)
+        return size, devices, commands
+
+    def _tokens_for(self, name):
+        tokens = self._name_tokens.get(name)
+        if tokens is None:
+            # Only indexed names are cached, see _post()
+            tokens = frozenset(tokenize(name))
+        return tokens
+
+    def _post(self, postings, name, key):
+        self._prefix_cache.clear()
+        tokens = self._tokens_for(name)
+        self._name_tokens[name] = tokens
+        self._name_refs[name] = self._name_refs.get(name, 0) + 1
+        for token in tokens:
+            if (
+                token not in self._device_postings
+                and token not in self._command_postings
+            ):
+                bisect.insort(self._tokens, token)
+            postings.setdefault(token, set()).add(key)
+
+    def _unpost(self, postings, name, key):
+        self._prefix_cache.clear()
+        tokens = self._tokens_for(name)
+        refs = self._name_refs.pop(name, 0) - 1
+        if refs > 0:
+            self._name_refs[name] = refs
+        else:
+            self._name_tokens.pop(name, None)
+        for token in tokens:
+            keys = postings.get(token)
+            if keys is None:
+                continue
+            keys.discard(key)
+            if not keys:
+                del postings[token]
+                if (
+                    token not in self._device_postings
+                    and token not in self._command_postings
+                ):
+                    del self._tokens[bisect.bisect_left(self._tokens, token)]
@@ -0,0 +1,95 @@
+import asyncio
+import logging
+import time
+from .const import METRIC_QUEUE_WAIT, SEND_QUEUE_MAXSIZE
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class SendQueue:
+    """Serialize transmissions to one hub.
+
+    A hub can only transmit one code at a time, so every send goes through a
+    single worker. Each job is an ordered list of (device, command) steps
+    that is transmitted without interleaving with other jobs. Callers
+    wait for their own job to finish, and wait to enqueue when the queue is
+    full. When a caller stops waiting (e.g. on a timeout) its job is
+    dropped, also between the steps and repeats of a job being sent.
+    """
+
+    def __init__(
+        self, hass, mac_address, transmit, metrics=None, maxsize=SEND_QUEUE_MAXSIZE
+    ):
+        self.hass = hass
+        self.mac_address = mac_address
+        self._transmit = transmit
+        self._metrics = metrics
+        self._queue = asyncio.Queue(maxsize)
+        self._worker = None
+
+    @property
+    def pending(self):
+        return self._queue.qsize()
+
+    def start(self):
+        if self._worker is None:
+            self._worker = self.hass.async_create_background_task(
+                self._async_worker(), f"broadlink_manager send queue {self.mac_address}"
+            )
+
+    async def async_stop(self):
+        """Stop the worker and fail jobs that have not been sent yet."""
+        worker, self._worker = self._worker, None
+        if worker is not None:
+            worker.cancel()
+            try:
+                await worker
+            except asyncio.CancelledError:
+                pass
+        while not self._queue.empty():
+            _, _, _, future, _ = self._queue.get_nowait()
+            if not future.done():
+                future.cancel()
+
+    async def async_send(self, steps, delay_secs=0, repeats=1):
+        """Queue steps as one job and wait until it has been transmitted."""
+        if self._worker is None:
+            self.start()
+        future = self.hass.loop.create_future()
+        await self._queue.put(
+            (list(steps), delay_secs, repeats, future, time.perf_counter())
+        )
+        return await future
+
+    async def _async_worker(self):
+        while True:
+            steps, delay_secs, repeats, future, queued_at = await self._queue.get()
+            try:
+                if future.cancelled():
+                    continue
+                if self._metrics is not None:
+                    self._metrics.record(
+                        METRIC_QUEUE_WAIT, (time.perf_counter() - queued_at) * 1000
+                    )
+                for index, (device_name, command_name) in enumerate(steps * repeats):
+                    if index and delay_secs:
+                        await asyncio.sleep(delay_secs)
+                    if future.cancelled():
+                        _LOGGER.debug(
+                            "Dropping the rest of a job for %s, its caller gave up",
+                            self.mac_address,
+                        )
+                        break
+                    await self._transmit(device_name, command_name)
+            except asyncio.CancelledError:
+                if not future.done():
+                    future.cancel()
+                raise
+            except Exception as err:  # pylint: disable=broad-except
+                if not future.done():
+                    future.set_exception(err)
+            else:
+                if not future.done():
+                    future.set_result(None)
+            finally:
+                self._queue.task_done()
@@ -0,0 +1,88 @@
+import logging
+from datetime import timedelta
+from homeassistant.components.sensor import SensorEntity, SensorStateClass
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import EntityCategory, UnitOfTime
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.device_registry import DeviceEntryType
+from .const import (
+    DOMAIN,
+    METRIC_CODES_LOAD,
+    METRIC_CODES_SAVE,
+    METRIC_HUB_PROBE,
+    METRIC_PRESS,
+    METRIC_QUEUE_WAIT,
+    METRIC_RELOAD,
+    METRIC_REMOTE_LOOKUP,
+    METRIC_SEND_DIRECT,
+    METRIC_SEND_SERVICE,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+SCAN_INTERVAL = timedelta(seconds=60)
+
+# Metrics recorded by the device manager and by its codes manager
+DEVICE_MANAGER_METRICS = (
+    METRIC_PRESS,
+    METRIC_QUEUE_WAIT,
+    METRIC_REMOTE_LOOKUP,
+    METRIC_SEND_DIRECT,
+    METRIC_SEND_SERVICE,
+    METRIC_RELOAD,
+)
+CODES_MANAGER_METRICS = (METRIC_CODES_LOAD, METRIC_CODES_SAVE)
+HUB_HEALTH_METRICS = (METRIC_HUB_PROBE,)
+
+
+async def async_setup_entry(
+    hass: HomeAssistant, config_entry: ConfigEntry, async_add_entities
+):
+    """Set up Broadlink Manager diagnostic sensors."""
+    device_manager = hass.data[DOMAIN][config_entry.entry_id]
+    async_add_entities(
+        [
+            MetricSensor(device_manager, device_manager.metrics, name)
+            for name in DEVICE_MANAGER_METRICS
+        ]
+        + [
+            MetricSensor(device_manager, device_manager.codes_manager.metrics, name)
+            for name in CODES_MANAGER_METRICS
+        ]
+        + [
+            MetricSensor(device_manager, device_manager.health.metrics, name)
+            for name in HUB_HEALTH_METRICS
+        ]
+    )
+
+
+class MetricSensor(SensorEntity):
+    """95th percentile of a timing metric, with the full summary as attributes."""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_suggested_display_precision = 1
+
+    def __init__(self, device_manager, metrics, metric_name):
+        self._metrics = metrics
+        self._metric_name = metric_name
+        mac_address = device_manager.mac_address
+        self._attr_name = f"{metric_name.replace('_', ' ').capitalize()} p95"
+        self._attr_unique_id = f"{mac_address}:metric:{metric_name}"
+        self._attr_device_info = {
+            "identifiers": {(DOMAIN, mac_address)},
+            "name": f"{device_manager.config_entry.title} Manager",
+            "manufacturer": "Broadlink",
+            "model": "Broadlink Manager",
+            "entry_type": DeviceEntryType.SERVICE,
+        }
+
+    @property
+    def native_value(self):
+        value = self._metrics.get(self._metric_name).percentile(95)
+        return None if value is None else round(value, 3)
+
+    @property
+    def extra_state_attributes(self):
+        return self._metrics.get(self._metric_name).summary()
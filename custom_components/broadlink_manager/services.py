@@ -0,0 +1,270 @@
+import logging
+import os
+import voluptuous as vol
+from homeassistant.core import HomeAssistant, ServiceCall, SupportsResponse
+from homeassistant.exceptions import HomeAssistantError
+import homeassistant.helpers.config_validation as cv
+from .const import (
+    DOMAIN,
+    ATTR_COMMAND,
+    ATTR_COMMANDS,
+    ATTR_DELAY_SECS,
+    ATTR_DEVICE,
+    ATTR_DEVICES,
+    ATTR_FILE_PATH,
+    ATTR_FORMAT,
+    ATTR_LIMIT,
+    ATTR_MAC_ADDRESS,
+    ATTR_MAC_ADDRESSES,
+    ATTR_NUM_REPEATS,
+    ATTR_OVERWRITE,
+    ATTR_QUERY,
+    ATTR_TIMEOUT,
+    DEFAULT_HUB_TIMEOUT,
+    DEFAULT_MACRO_DELAY,
+    SEARCH_LIMIT,
+    SEARCH_LIMIT_MAX,
+    SERVICE_CODE_REPORT,
+    SERVICE_EXPORT_CODES,
+    SERVICE_IMPORT_CODES,
+    SERVICE_SEARCH_CODES,
+    SERVICE_SEND_COMMAND,
+    SERVICE_SEND_MACRO,
+    SERVICE_SEND_TO_HUBS,
+)
+from .code_library import FORMATS, CodeLibraryError
+from .codes_manager import async_build_code_report, async_search_codes
+from .device_manager import DeviceManager
+from .fan_out import async_fan_out
+from .helpers.utils import normalize_mac
+
+_LOGGER = logging.getLogger(__name__)
+
+SEND_MACRO_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_MAC_ADDRESS): cv.string,
+        vol.Required(ATTR_DEVICE): cv.string,
+        vol.Required(ATTR_COMMANDS): vol.All(cv.ensure_list, [cv.string]),
+        vol.Optional(ATTR_DELAY_SECS, default=DEFAULT_MACRO_DELAY): vol.All(
+            vol.Coerce(float), vol.Range(min=0)
+        ),
+        vol.Optional(ATTR_NUM_REPEATS, default=1): vol.All(
+            vol.Coerce(int), vol.Range(min=1)
+        ),
+    }
+)
+
+SEND_COMMAND_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_MAC_ADDRESS): cv.string,
+        vol.Required(ATTR_DEVICE): cv.string,
+        vol.Required(ATTR_COMMAND): cv.string,
+        vol.Optional(ATTR_DELAY_SECS, default=DEFAULT_MACRO_DELAY): vol.All(
+            vol.Coerce(float), vol.Range(min=0)
+        ),
+        vol.Optional(ATTR_NUM_REPEATS, default=1): vol.All(
+            vol.Coerce(int), vol.Range(min=1)
+        ),
+    }
+)
+
+SEND_TO_HUBS_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_MAC_ADDRESSES): vol.All(cv.ensure_list, [cv.string]),
+        vol.Required(ATTR_DEVICE): cv.string,
+        vol.Required(ATTR_COMMAND): cv.string,
+        vol.Optional(ATTR_TIMEOUT, default=DEFAULT_HUB_TIMEOUT): vol.All(
+            vol.Coerce(float), vol.Range(min=0.1)
+        ),
+        vol.Optional(ATTR_DELAY_SECS, default=DEFAULT_MACRO_DELAY): vol.All(
+            vol.Coerce(float), vol.Range(min=0)
+        ),
+        vol.Optional(ATTR_NUM_REPEATS, default=1): vol.All(
+            vol.Coerce(int), vol.Range(min=1)
+        ),
+    }
+)
+
+SEARCH_CODES_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_QUERY): cv.string,
+        vol.Optional(ATTR_MAC_ADDRESS): cv.string,
+        vol.Optional(ATTR_LIMIT, default=SEARCH_LIMIT): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=SEARCH_LIMIT_MAX)
+        ),
+    }
+)
+
+IMPORT_CODES_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_MAC_ADDRESS): cv.string,
+        vol.Required(ATTR_FILE_PATH): cv.string,
+        vol.Required(ATTR_FORMAT): vol.In(FORMATS),
+        vol.Optional(ATTR_DEVICE): cv.string,
+        vol.Optional(ATTR_OVERWRITE, default=False): cv.boolean,
+    }
+)
+
+EXPORT_CODES_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_MAC_ADDRESS): cv.string,
+        vol.Required(ATTR_FILE_PATH): cv.string,
+        vol.Required(ATTR_FORMAT): vol.In(FORMATS),
+        vol.Optional(ATTR_DEVICES): vol.All(cv.ensure_list, [cv.string]),
+    }
+)
+
+
+def get_device_manager(hass: HomeAssistant, mac_address):
+    """Return the device manager of a loaded entry for the given hub MAC."""
+    mac_address = normalize_mac(mac_address)
+    for device_manager in hass.data.get(DOMAIN, {}).values():
+        if (
+            isinstance(device_manager, DeviceManager)
+            and device_manager.mac_address == mac_address
+        ):
+            return device_manager
+    raise HomeAssistantError(f"No Broadlink Manager entry for hub {mac_address}")
+
+
+def get_library_path(hass: HomeAssistant, path):
+    """Resolve a library path against the config directory and check access."""
+    path = hass.config.path(path) if not os.path.isabs(path) else path
+    if not hass.config.is_allowed_path(path):
+        raise HomeAssistantError(f"Access to {path} is not allowed")
+    return path
+
+
+SERVICES = (
+    SERVICE_SEND_MACRO,
+    SERVICE_SEND_COMMAND,
+    SERVICE_SEND_TO_HUBS,
+    SERVICE_SEARCH_CODES,
+    SERVICE_CODE_REPORT,
+    SERVICE_IMPORT_CODES,
+    SERVICE_EXPORT_CODES,
+)
+
+
+def async_unload_services(hass: HomeAssistant):
+    """Remove the integration services."""
+    for service in SERVICES:
+        hass.services.async_remove(DOMAIN, service)
+
+
+def async_setup_services(hass: HomeAssistant):
+    """Register the integration services once."""
+    if hass.services.has_service(DOMAIN, SERVICE_SEND_MACRO):
+        return
+
+    async def async_send_macro(call: ServiceCall):
+        device_manager = get_device_manager(hass, call.data[ATTR_MAC_ADDRESS])
+        await device_manager.async_send_macro(
+            call.data[ATTR_DEVICE],
+            call.data[ATTR_COMMANDS],
+            delay_secs=call.data[ATTR_DELAY_SECS],
+            repeats=call.data[ATTR_NUM_REPEATS],
+        )
+
+    async def async_send_command(call: ServiceCall):
+        # Also reaches commands that are not exposed as button entities
+        device_manager = get_device_manager(hass, call.data[ATTR_MAC_ADDRESS])
+        await device_manager.async_send_command(
+            call.data[ATTR_DEVICE],
+            call.data[ATTR_COMMAND],
+            repeats=call.data[ATTR_NUM_REPEATS],
+            delay_secs=call.data[ATTR_DELAY_SECS],
+        )
+
+    async def async_send_to_hubs(call: ServiceCall):
+        # The same logical command through several hubs at once
+        return {
+            "hubs": await async_fan_out(
+                hass,
+                call.data[ATTR_DEVICE],
+                call.data[ATTR_COMMAND],
+                mac_addresses=call.data.get(ATTR_MAC_ADDRESSES),
+                timeout=call.data[ATTR_TIMEOUT],
+                repeats=call.data[ATTR_NUM_REPEATS],
+                delay_secs=call.data[ATTR_DELAY_SECS],
+            )
+        }
+
+    async def async_import_codes(call: ServiceCall):
+        device_manager = get_device_manager(hass, call.data[ATTR_MAC_ADDRESS])
+        try:
+            return await device_manager.codes_manager.async_import_codes(
+                get_library_path(hass, call.data[ATTR_FILE_PATH]),
+                call.data[ATTR_FORMAT],
+                device_name=call.data.get(ATTR_DEVICE),
+                overwrite=call.data[ATTR_OVERWRITE],
+            )
+        except (OSError, CodeLibraryError) as err:
+            raise HomeAssistantError(f"Could not import codes: {err}") from err
+
+    async def async_export_codes(call: ServiceCall):
+        device_manager = get_device_manager(hass, call.data[ATTR_MAC_ADDRESS])
+        try:
+            return await device_manager.codes_manager.async_export_codes(
+                get_library_path(hass, call.data[ATTR_FILE_PATH]),
+                call.data[ATTR_FORMAT],
+                devices=call.data.get(ATTR_DEVICES),
+            )
+        except (OSError, CodeLibraryError) as err:
+            raise HomeAssistantError(f"Could not export codes: {err}") from err
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_SEND_MACRO, async_send_macro, schema=SEND_MACRO_SCHEMA
+    )
+    hass.services.async_register(
+        DOMAIN, SERVICE_SEND_COMMAND, async_send_command, schema=SEND_COMMAND_SCHEMA
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_SEND_TO_HUBS,
+        async_send_to_hubs,
+        schema=SEND_TO_HUBS_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+    async def async_search(call: ServiceCall):
+        mac_address = call.data.get(ATTR_MAC_ADDRESS)
+        return {
+            "results": await async_search_codes(
+                hass,
+                call.data[ATTR_QUERY],
+                mac_address=mac_address and normalize_mac(mac_address),
+                limit=call.data[ATTR_LIMIT],
+            )
+        }
+
+    async def async_code_report(call: ServiceCall):
+        return await async_build_code_report(hass)
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_SEARCH_CODES,
+        async_search,
+        schema=SEARCH_CODES_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_CODE_REPORT,
+        async_code_report,
+        supports_response=SupportsResponse.ONLY,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_IMPORT_CODES,
+        async_import_codes,
+        schema=IMPORT_CODES_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_EXPORT_CODES,
+        async_export_codes,
+        schema=EXPORT_CODES_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
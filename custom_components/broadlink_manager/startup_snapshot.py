@@ -0,0 +1,74 @@
+import logging
+from homeassistant.helpers.storage import Store
+from .const import DOMAIN, SNAPSHOT_FORMAT, SNAPSHOT_SAVE_DELAY
+from .helpers.utils import format_name
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class StartupSnapshot:
+    """The buttons of one hub as of the last sync, persisted for a fast boot.
+
+    Stores the content hash of the codes the buttons were built from, the
+    exposure options in effect and, per device, its formatted name and the
+    formatted names of its exposed commands. Button unique IDs are derived
+    from the MAC, device and command names, so they are not stored.
+    """
+
+    def __init__(self, hass, mac_address):
+        self.hass = hass
+        self.mac_address = mac_address
+        self.store = Store(hass, 1, f"{DOMAIN}_{mac_address}_snapshot")
+        self.content_hash = None
+        self.exposure = None
+        self.devices = None  # device -> [formatted name, {command: formatted name}]
+        self._entities = {}  # device -> set of command names, as last recorded
+
+    @property
+    def loaded(self):
+        return self.devices is not None
+
+    async def async_load(self):
+        """Load the stored snapshot; devices stays None if it is unusable."""
+        data = await self.store.async_load()
+        if not data:
+            return
+        if (
+            data.get("format") != SNAPSHOT_FORMAT
+            or data.get("mac_address") != self.mac_address
+        ):
+            _LOGGER.debug("Ignoring outdated startup snapshot for %s", self.mac_address)
+            return
+        self.content_hash = data["content_hash"]
+        self.exposure = data["exposure"]
+        self.devices = data["devices"]
+
+    def pop_devices(self):
+        """Return the loaded devices once; they are not needed after boot."""
+        devices, self.devices = self.devices, None
+        return devices
+
+    def record(self, content_hash, exposure, entities):
+        """Remember the buttons built from the codes with content_hash."""
+        self.content_hash = content_hash
+        self.exposure = exposure
+        self._entities = entities
+        self.store.async_delay_save(self._data_to_save, SNAPSHOT_SAVE_DELAY)
+
+    def _data_to_save(self):
+        return {
+            "format": SNAPSHOT_FORMAT,
+            "mac_address": self.mac_address,
+            "content_hash": self.content_hash,
+            "exposure": self.exposure,
+            "devices": {
+                device_name: [
+                    format_name(device_name),
+                    {
+                        command_name: format_name(command_name)
+                        for command_name in commands
+                    },
+                ]
+                for device_name, commands in self._entities.items()
+            },
+        }
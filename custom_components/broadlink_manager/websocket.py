@@ -0,0 +1,42 @@
+import voluptuous as vol
+from homeassistant.components import websocket_api
+from homeassistant.core import HomeAssistant, callback
+from .codes_manager import async_search_codes
+from .const import DATA_WEBSOCKET, SEARCH_LIMIT, SEARCH_LIMIT_MAX
+from .helpers.utils import normalize_mac
+
+
+@callback
+def async_setup_websocket(hass: HomeAssistant):
+    """Register the integration's websocket commands once."""
+    if hass.data.get(DATA_WEBSOCKET):
+        return
+    hass.data[DATA_WEBSOCKET] = True
+    websocket_api.async_register_command(hass, websocket_search)
+
+
+@websocket_api.websocket_command(
+    {
+        vol.Required("type"): "broadlink_manager/search",
+        vol.Required("query"): str,
+        vol.Optional("mac_address"): str,
+        vol.Optional("limit", default=SEARCH_LIMIT): vol.All(
+            int, vol.Range(min=1, max=SEARCH_LIMIT_MAX)
+        ),
+    }
+)
+@websocket_api.async_response
+async def websocket_search(hass, connection, msg):
+    """Search device and command names, for pickers in the frontend."""
+    mac_address = msg.get("mac_address")
+    connection.send_result(
+        msg["id"],
+        {
+            "results": await async_search_codes(
+                hass,
+                msg["query"],
+                mac_address=mac_address and normalize_mac(mac_address),
+                limit=msg["limit"],
+            )
+        },
+    )
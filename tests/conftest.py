@@ -0,0 +1,26 @@
+"""Make the integration's pure modules importable without Home Assistant.
+
+The package __init__ imports Home Assistant, so the packages are registered
+as bare modules and only the submodules under test are imported.
+"""
+
+import os
+import sys
+import types
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE_DIR = os.path.join(REPO_ROOT, "custom_components", "broadlink_manager")
+
+
+def _package(name, path):
+    module = sys.modules.get(name)
+    if module is None:
+        module = sys.modules[name] = types.ModuleType(name)
+    module.__path__ = [path]
+
+
+_package("custom_components", os.path.join(REPO_ROOT, "custom_components"))
+_package("custom_components.broadlink_manager", PACKAGE_DIR)
+_package(
+    "custom_components.broadlink_manager.helpers", os.path.join(PACKAGE_DIR, "helpers")
+)
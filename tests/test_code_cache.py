@@ -0,0 +1,106 @@
+import base64
+
+from custom_components.broadlink_manager.code_cache import CodeCache, CodePool
+
+CODE_A = base64.b64encode(b"\x26\x00\x02\x00\x10\x20").decode()
+CODE_B = base64.b64encode(b"\x26\x00\x02\x00\x30\x40").decode()
+
+
+def test_pool_holds_shared_payload_once():
+    pool = CodePool()
+    first = pool.acquire(CODE_A)
+    second = pool.acquire(CODE_A)
+    assert first == second
+    assert len(pool) == 1
+    assert pool.memory_usage()["references"] == 2
+
+    pool.release(first)
+    assert pool.get(first) == base64.b64decode(CODE_A)
+    pool.release(second)
+    assert len(pool) == 0
+    assert pool.get(first) is None
+
+
+def test_pool_ignores_invalid_codes():
+    pool = CodePool()
+    assert pool.acquire("not base64!") is None
+    pool.release(None)
+    assert len(pool) == 0
+
+
+def test_pool_toggle_digest_differs_from_joined_code():
+    pool = CodePool()
+    toggle = pool.acquire([CODE_A, CODE_B])
+    assert pool.get(toggle) == (base64.b64decode(CODE_A), base64.b64decode(CODE_B))
+    assert toggle != CodePool.digest(
+        base64.b64decode(CODE_A) + base64.b64decode(CODE_B)
+    )
+
+
+def test_pool_merge_moves_references():
+    shared = CodePool()
+    shared.acquire(CODE_A)
+    private = CodePool()
+    digest = private.acquire(CODE_A)
+    private.acquire(CODE_B)
+
+    shared.merge(private)
+    assert len(private) == 0
+    assert len(shared) == 2
+    assert shared.memory_usage()["references"] == 3
+    shared.release(digest)
+    assert shared.get(digest) is not None
+
+
+def test_cache_set_releases_replaced_code():
+    pool = CodePool()
+    cache = CodeCache(pool)
+    cache.set("tv", "power", CODE_A)
+    cache.set("tv", "power", CODE_B)
+    assert len(pool) == 1
+    assert cache.get("tv", "power") == base64.b64decode(CODE_B)
+
+    cache.set("tv", "power", CODE_B)
+    assert pool.memory_usage()["references"] == 1
+
+
+def test_cache_rename_command_releases_overwritten_command():
+    pool = CodePool()
+    cache = CodeCache(pool)
+    cache.set("tv", "power", CODE_A)
+    cache.set("tv", "on", CODE_B)
+    cache.rename_command("tv", "power", "on")
+    assert cache.get("tv", "power") is None
+    assert cache.get("tv", "on") == base64.b64decode(CODE_A)
+    assert len(pool) == 1
+
+
+def test_cache_rename_device_and_remove():
+    pool = CodePool()
+    cache = CodeCache(pool)
+    cache.build({"tv": {"power": CODE_A}, "fan": {"on": CODE_A, "off": CODE_B}})
+    cache.rename_device("fan", "tv")
+    assert cache.get("tv", "off") == base64.b64decode(CODE_B)
+    assert cache.get("tv", "power") is None
+    assert pool.memory_usage()["references"] == 2
+
+    cache.remove("tv", "off")
+    assert len(pool) == 1
+    cache.remove_device("tv")
+    assert len(pool) == 0
+
+
+def test_cache_attach_and_detach():
+    shared = CodePool()
+    other = CodeCache(shared)
+    other.set("fan", "on", CODE_A)
+
+    cache = CodeCache()
+    cache.build({"tv": {"power": CODE_A, "mute": CODE_B}})
+    cache.attach(shared)
+    assert len(shared) == 2
+    assert cache.get("tv", "mute") == base64.b64decode(CODE_B)
+
+    cache.detach()
+    assert len(shared) == 1
+    assert other.get("fan", "on") == base64.b64decode(CODE_A)
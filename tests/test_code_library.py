@@ -0,0 +1,260 @@
+import base64
+import io
+import json
+
+import pytest
+
+from custom_components.broadlink_manager.code_library import (
+    BROADLINK_TICK,
+    FORMAT_BROADLINK,
+    FORMAT_PRONTO,
+    FORMAT_RAW,
+    FORMAT_SMARTIR,
+    CodeLibraryError,
+    JsonStream,
+    normalize_code,
+    packet_to_pulses,
+    pronto_to_pulses,
+    pulses_to_packet,
+    pulses_to_pronto,
+    read_code_library,
+    validate_packet,
+    write_code_library,
+)
+
+PULSES = [9000, 4500, 560, 560, 560, 1690, 560, 40000]
+PRONTO = "0000 006D 0002 0000 0156 00AB 0015 0015"
+RF_CODE = base64.b64encode(b"\xb2\x00\x02\x00\x10\x20").decode()
+
+
+def to_pulses(code):
+    return packet_to_pulses(base64.b64decode(code))
+
+
+def assert_close(pulses, expected, tolerance=BROADLINK_TICK * 2):
+    assert len(pulses) == len(expected)
+    for pulse, duration in zip(pulses, expected):
+        assert abs(pulse - abs(duration)) <= tolerance
+
+
+def test_pulses_to_packet_tick_forms():
+    packet = pulses_to_packet([5, 500, 9000])
+    assert packet[:4] == b"\x26\x00\x05\x00"
+    # Short pulses keep one tick, long ones use the 0x00 two-byte form
+    assert packet[4] == 1
+    assert packet[5] == round(500 / BROADLINK_TICK)
+    assert packet[6:9] == b"\x00" + round(9000 / BROADLINK_TICK).to_bytes(2, "big")
+    assert_close(packet_to_pulses(packet), [5, 500, 9000])
+
+
+def test_pulses_to_packet_rejects_bad_pulses():
+    with pytest.raises(CodeLibraryError):
+        pulses_to_packet([])
+    with pytest.raises(CodeLibraryError):
+        pulses_to_packet([BROADLINK_TICK * 0x10000])
+
+
+def test_pronto_round_trip():
+    assert_close(pronto_to_pulses(pulses_to_pronto(PULSES)), PULSES, 30)
+    # Odd pulse counts are padded to whole pairs
+    assert len(pronto_to_pulses(pulses_to_pronto(PULSES[:3]))) == 4
+
+
+@pytest.mark.parametrize(
+    "pronto",
+    [
+        "0000 006D 00XY 0000 0015 0015",
+        "0100 006D 0001 0000 0015 0015",
+        "0000 0000 0001 0000 0015 0015",
+        "0000 006D 0002 0000 0015 0015",
+        "0000 006D",
+    ],
+)
+def test_pronto_rejects_bad_codes(pronto):
+    with pytest.raises(CodeLibraryError):
+        pronto_to_pulses(pronto)
+
+
+def test_validate_packet():
+    validate_packet(base64.b64decode(RF_CODE))
+    with pytest.raises(CodeLibraryError):
+        validate_packet(b"\x26\x00")
+    with pytest.raises(CodeLibraryError):
+        validate_packet(b"\x99\x00\x01\x00\x10")
+    with pytest.raises(CodeLibraryError):
+        validate_packet(b"\x26\x00\x09\x00\x10")
+
+
+def test_normalize_code_detects_encoding():
+    raw = normalize_code(",".join(str(pulse) for pulse in PULSES))
+    assert_close(to_pulses(raw), PULSES)
+    assert normalize_code(PULSES) == raw
+    assert normalize_code(raw) == raw
+    assert normalize_code(" " + raw.rstrip("=") + " ") == raw
+    assert normalize_code(PRONTO) == normalize_code(PRONTO, "pronto")
+    assert_close(to_pulses(normalize_code(PRONTO)), pronto_to_pulses(PRONTO))
+    assert normalize_code([raw, RF_CODE]) == [raw, RF_CODE]
+
+
+@pytest.mark.parametrize(
+    "code, encoding",
+    [
+        ("", None),
+        (None, None),
+        ({"a": 1}, None),
+        ([1, "a"], None),
+        ("1,abc", "raw"),
+        ("0100 006D 0001 0000 0015 0015", None),
+        ("JgA", "base64"),
+        (base64.b64encode(b"\x99\x00\x01\x00\x10").decode(), None),
+    ],
+)
+def test_normalize_code_rejects_invalid_codes(code, encoding):
+    with pytest.raises(CodeLibraryError):
+        normalize_code(code, encoding)
+
+
+def test_json_stream_small_chunks():
+    document = '{"a": {"b": 123456, "c": "text"}, "d": [1, 2], "e": {}}'
+    leaves = list(JsonStream(io.StringIO(document), chunk_size=3).leaves())
+    assert leaves == [(("a", "b"), 123456), (("a", "c"), "text"), (("d",), [1, 2])]
+
+
+@pytest.mark.parametrize("document", ['{"a" 1}', '{"a": {"b": 1}', '{"a": 1 "b": 2}'])
+def test_json_stream_rejects_bad_documents(document):
+    with pytest.raises(CodeLibraryError):
+        list(JsonStream(io.StringIO(document), chunk_size=4).leaves())
+
+
+def write_file(tmp_path, text):
+    path = tmp_path / "library"
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def test_read_broadlink_storage_envelope(tmp_path):
+    code = normalize_code(PULSES)
+    path = write_file(
+        tmp_path,
+        json.dumps(
+            {
+                "version": 1,
+                "key": "broadlink_remote_codes",
+                "data": {"tv": {"power": code, "toggle": [code, RF_CODE]}},
+            }
+        ),
+    )
+    assert list(read_code_library(path, FORMAT_BROADLINK)) == [
+        ("tv", "power", code, None),
+        ("tv", "toggle", [code, RF_CODE], None),
+    ]
+    assert [entry[0] for entry in read_code_library(path, FORMAT_BROADLINK, "amp")] == [
+        "amp",
+        "amp",
+    ]
+
+
+def test_read_smartir_flattens_commands(tmp_path):
+    path = write_file(
+        tmp_path,
+        json.dumps(
+            {
+                "manufacturer": "Test",
+                "commandsEncoding": "Pronto",
+                "commands": {"off": PRONTO, "cool": {"auto": {"18": PRONTO}}},
+            }
+        ),
+    )
+    entries = list(read_code_library(path, FORMAT_SMARTIR, "ac"))
+    assert [(entry[0], entry[1]) for entry in entries] == [
+        ("ac", "off"),
+        ("ac", "cool_auto_18"),
+    ]
+    assert all(entry[2] == normalize_code(PRONTO) for entry in entries)
+
+
+def test_read_lines_skips_comments_and_rejects_entries(tmp_path):
+    path = write_file(
+        tmp_path,
+        "# exported codes\n"
+        "\n"
+        "tv/power: 9000,-4500,560,-560\n"
+        "mute = 560 560 560\n"
+        "tv/bad: 560,abc\n",
+    )
+    entries = list(read_code_library(path, FORMAT_RAW))
+    assert [entry[:2] for entry in entries] == [
+        ("tv", "power"),
+        (None, "mute"),
+        ("tv", "bad"),
+    ]
+    assert_close(to_pulses(entries[0][2]), [9000, 4500, 560, 560])
+    assert entries[0][3] is None
+    assert entries[1][2] is None
+    assert entries[1][3] == "None/mute: No device name given"
+    assert entries[2][2] is None
+    assert entries[2][3].startswith("tv/bad: Invalid raw code")
+
+    # A device given for the import also applies to "device/command" lines
+    entries = list(read_code_library(path, FORMAT_RAW, "amp"))
+    assert [entry[:2] for entry in entries[:2]] == [
+        ("amp", "tv/power"),
+        ("amp", "mute"),
+    ]
+
+
+def test_read_lines_rejects_malformed_line(tmp_path):
+    path = write_file(tmp_path, "tv/power: " + PRONTO + "\nnot a code line\n")
+    entries = read_code_library(path, FORMAT_PRONTO)
+    assert next(entries)[2] == normalize_code(PRONTO)
+    with pytest.raises(CodeLibraryError, match="Line 2"):
+        next(entries)
+
+
+def test_read_checks_arguments_eagerly(tmp_path):
+    missing = str(tmp_path / "missing")
+    with pytest.raises(CodeLibraryError):
+        read_code_library(missing, "csv")
+    with pytest.raises(CodeLibraryError):
+        read_code_library(missing, FORMAT_SMARTIR)
+    # The file is only opened once the iterator is advanced
+    entries = read_code_library(missing, FORMAT_BROADLINK)
+    with pytest.raises(OSError):
+        next(entries)
+
+
+def test_write_round_trip(tmp_path):
+    code = normalize_code(PULSES)
+    codes = {"tv": {"power": code, "toggle": [code, RF_CODE]}, "fan": {"on": RF_CODE}}
+    path = str(tmp_path / "codes.json")
+
+    assert write_code_library(path, FORMAT_BROADLINK, codes) == (3, 0)
+    read = {}
+    for device_name, command_name, value, error in read_code_library(
+        path, FORMAT_BROADLINK
+    ):
+        assert error is None
+        read.setdefault(device_name, {})[command_name] = value
+    assert read == codes
+
+    assert write_code_library(path, FORMAT_SMARTIR, {"tv": codes["tv"]}) == (2, 0)
+    assert [entry[:3] for entry in read_code_library(path, FORMAT_SMARTIR, "tv")] == [
+        ("tv", "power", code),
+        ("tv", "toggle", [code, RF_CODE]),
+    ]
+
+
+@pytest.mark.parametrize("code_format", [FORMAT_PRONTO, FORMAT_RAW])
+def test_write_skips_codes_without_pulses(tmp_path, code_format):
+    code = normalize_code(PULSES)
+    codes = {"tv": {"power": code, "toggle": [code, code]}, "fan": {"on": RF_CODE}}
+    path = str(tmp_path / "codes.txt")
+    assert write_code_library(path, code_format, codes) == (1, 2)
+    entries = list(read_code_library(path, code_format))
+    assert [entry[:2] for entry in entries] == [("tv", "power")]
+    assert_close(to_pulses(entries[0][2]), PULSES, 60)
+
+
+def test_write_rejects_unknown_format(tmp_path):
+    with pytest.raises(CodeLibraryError):
+        write_code_library(str(tmp_path / "codes"), "csv", {})
@@ -0,0 +1,149 @@
+from custom_components.broadlink_manager.code_store import (
+    CodesSnapshot,
+    CodesWriter,
+    diff_codes,
+    hash_codes,
+    merge_codes,
+)
+
+
+def make_base():
+    return {
+        "tv": {"power": "AAA", "mute": "BBB"},
+        "fan": {"on": "CCC", "off": "DDD"},
+    }
+
+
+def test_diff_codes_changes_added_and_removed():
+    base = make_base()
+    other = {
+        "tv": {"power": "AAA", "mute": "XXX", "input": "EEE"},
+        "light": {},
+    }
+    changes, added, removed = diff_codes(base, other)
+    assert changes == {
+        ("tv", "mute"): "XXX",
+        ("tv", "input"): "EEE",
+        ("fan", "on"): None,
+        ("fan", "off"): None,
+    }
+    assert added == {"light"}
+    assert removed == {"fan"}
+
+
+def test_diff_codes_skips_shared_commands():
+    base = make_base()
+    other = dict(base)
+    other["tv"] = dict(base["tv"], power="ZZZ")
+    changes, added, removed = diff_codes(base, other)
+    assert changes == {("tv", "power"): "ZZZ"}
+    assert not added and not removed
+
+
+def test_merge_codes_applies_unrelated_changes():
+    base = make_base()
+    ours = dict(base, tv=dict(base["tv"], power="OURS"))
+    theirs = dict(base, fan=dict(base["fan"], on="THEIRS"))
+    apply, added, removed, rejected = merge_codes(base, ours, theirs)
+    assert apply == {("fan", "on"): "THEIRS"}
+    assert not added and not removed and not rejected
+
+
+def test_merge_codes_rejects_conflicting_change():
+    base = make_base()
+    ours = dict(base, tv=dict(base["tv"], power="OURS"))
+    theirs = dict(base, tv=dict(base["tv"], power="THEIRS", mute="THEIRS"))
+    apply, _, _, rejected = merge_codes(base, ours, theirs)
+    assert apply == {("tv", "mute"): "THEIRS"}
+    assert rejected == [("tv", "power")]
+
+
+def test_merge_codes_accepts_identical_change():
+    base = make_base()
+    ours = dict(base, tv=dict(base["tv"], power="SAME"))
+    theirs = dict(base, tv=dict(base["tv"], power="SAME"))
+    apply, _, _, rejected = merge_codes(base, ours, theirs)
+    assert apply == {}
+    assert rejected == []
+
+
+def test_merge_codes_rejects_change_to_device_we_removed():
+    base = make_base()
+    ours = {"tv": base["tv"]}
+    theirs = dict(base, fan=dict(base["fan"], on="THEIRS"))
+    apply, _, removed, rejected = merge_codes(base, ours, theirs)
+    assert apply == {}
+    assert not removed
+    assert rejected == [("fan", "on")]
+
+
+def test_merge_codes_rejects_removing_device_we_changed():
+    base = make_base()
+    ours = dict(base, fan=dict(base["fan"], on="OURS"))
+    theirs = {"tv": base["tv"]}
+    apply, _, removed, rejected = merge_codes(base, ours, theirs)
+    assert not removed
+    assert ("fan", None) in rejected
+    assert ("fan", "on") in rejected
+    assert apply == {("fan", "off"): None}
+
+
+def test_merge_codes_removes_device_and_drops_its_commands():
+    base = make_base()
+    ours = dict(base, tv=dict(base["tv"], power="OURS"))
+    theirs = {"tv": base["tv"]}
+    apply, added, removed, rejected = merge_codes(base, ours, theirs)
+    assert removed == {"fan"}
+    assert apply == {}
+    assert not added and not rejected
+
+
+def test_merge_codes_adds_new_devices():
+    base = make_base()
+    ours = dict(base, light={"on": "OURS"})
+    theirs = dict(base, light={"on": "THEIRS"}, radio={"play": "FFF"})
+    apply, added, _, rejected = merge_codes(base, ours, theirs)
+    assert added == {"radio"}
+    assert apply[("radio", "play")] == "FFF"
+    assert rejected == [("light", "on")]
+
+
+def test_writer_is_copy_on_write():
+    base = CodesSnapshot(1, make_base())
+    writer = CodesWriter(base)
+    writer.set("tv", "power", "NEW")
+    writer.add_device("light")
+    snapshot = writer.commit()
+    assert snapshot.version == 2
+    assert base.codes == make_base()
+    assert snapshot.codes["tv"]["power"] == "NEW"
+    assert snapshot.codes["fan"] is base.codes["fan"]
+    assert set(writer.changed_devices()) == {"tv", "light"}
+
+
+def test_writer_rename_and_delete():
+    writer = CodesWriter(CodesSnapshot(1, make_base()))
+    writer.rename_device("fan", "ceiling_fan")
+    writer.delete("tv", "mute")
+    codes = writer.commit().codes
+    assert codes == {
+        "tv": {"power": "AAA"},
+        "ceiling_fan": {"on": "CCC", "off": "DDD"},
+    }
+
+
+def test_content_hash_follows_changes():
+    base = CodesSnapshot(1, make_base())
+    assert base.content_hash == hash_codes(make_base())
+
+    writer = CodesWriter(base)
+    writer.set("tv", "power", "NEW")
+    writer.rename_device("fan", "ceiling_fan")
+    snapshot = writer.commit()
+    assert snapshot.content_hash == hash_codes(snapshot.codes)
+    assert snapshot.content_hash != base.content_hash
+
+    writer = CodesWriter(snapshot)
+    writer.set("tv", "power", "AAA")
+    writer.rename_device("ceiling_fan", "fan")
+    assert writer.commit().content_hash == base.content_hash
@@ -0,0 +1,87 @@
+from custom_components.broadlink_manager.search_index import SearchIndex, tokenize
+
+
+def make_index():
+    index = SearchIndex()
+    index.build(
+        {
+            "livingRoom_TV": ["power", "volume_up", "volume_down", "mute"],
+            "bedroom_tv": ["power", "input_hdmi"],
+            "ceiling_fan": ["speed_up", "power"],
+        }
+    )
+    return index
+
+
+def test_tokenize():
+    tokens = tokenize("livingRoom_TV")
+    assert {"living", "room", "tv", "livingroom", "livingroom_tv"} <= tokens
+    assert "livingroom tv" in tokens
+    assert "" not in tokens
+
+
+def test_search_by_prefix_and_camel_case():
+    index = make_index()
+    assert ("livingRoom_TV", None) in index.search("room")
+    assert index.search("vol", device_name="livingRoom_TV") == [
+        ("livingRoom_TV", "volume_down"),
+        ("livingRoom_TV", "volume_up"),
+    ]
+    assert index.search("") == []
+    assert index.search("nothing") == []
+
+
+def test_search_mixes_device_and_command_words():
+    index = make_index()
+    assert index.search("bedroom power") == [("bedroom_tv", "power")]
+    assert index.search("fan speed") == [("ceiling_fan", "speed_up")]
+    assert index.search("tv power") == [
+        ("bedroom_tv", "power"),
+        ("livingRoom_TV", "power"),
+    ]
+
+
+def test_search_ranks_exact_matches_and_limits():
+    index = make_index()
+    assert index.search("power")[0][1] == "power"
+    assert len(index.search("power", limit=2)) == 2
+    ranked = index.search_ranked("tv")
+    assert ranked == sorted(ranked)
+    # Device matches come before their commands
+    assert ranked[0][1] == ("bedroom_tv", None)
+
+
+def test_remove_and_rename():
+    index = make_index()
+    index.remove("bedroom_tv", "power")
+    assert index.search("bedroom power") == []
+    index.remove_device("ceiling_fan")
+    assert index.search("speed") == []
+    assert index.search("ceiling") == []
+
+    index.rename_device("bedroom_tv", "guest_tv")
+    assert index.search("bedroom") == []
+    assert index.search("guest hdmi") == [("guest_tv", "input_hdmi")]
+
+
+def test_name_tokens_are_evicted_with_the_last_posting():
+    index = make_index()
+    index.remove_device("ceiling_fan")
+    assert "ceiling_fan" not in index._name_tokens
+    assert "speed_up" not in index._name_tokens
+    # "power" is still used by the other devices
+    assert "power" in index._name_tokens
+
+    index.remove("livingRoom_TV", "power")
+    index.remove("bedroom_tv", "power")
+    assert "power" not in index._name_tokens
+    assert not any(token.startswith("pow") for token in index._tokens)
+
+
+def test_rank_compares_across_indexes():
+    first = SearchIndex()
+    first.build({"tv": ["power"]})
+    second = SearchIndex()
+    second.build({"amp": ["powerup"]})
+    merged = sorted(first.search_ranked("power") + second.search_ranked("power"))
+    assert [key for _, key in merged] == [("tv", "power"), ("amp", "powerup")]